@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class EncyclopediaConfig(AppConfig):
     name = 'encyclopedia'
+
+    def ready(self):
+        # Connect the receivers of entry signals
+        from . import links, publish, rendering, revisions, search_index
@@ -0,0 +1,149 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the histogram buckets: 1us * 1.25^k, up to ~2 minutes
+BUCKETS = [1e-6 * 1.25 ** k for k in range(84)]
+
+# Durations of the stages of the current request (stage -> seconds)
+_requestStages = ContextVar("requestStages", default=None)
+
+
+def enabled():
+    """
+    Returns True if instrumentation is enabled (the WIKI_INSTRUMENTATION setting).
+    """
+    return getattr(settings, "WIKI_INSTRUMENTATION", False)
+
+
+class Histogram:
+    """
+    A thread-safe histogram of durations with exponential buckets
+    (recording is O(log buckets), percentiles are within 25%).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, p):
+        """
+        Returns the upper bound (in seconds) of the bucket holding the p-th percentile.
+        """
+        with self._lock:
+            rank = p / 100 * self.count
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= rank:
+                    return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return 0.0
+
+    def summary(self):
+        # Durations in milliseconds
+        return {
+            "count": self.count,
+            "mean": self.total / self.count * 1000 if self.count else 0.0,
+            "p50": self.percentile(50) * 1000,
+            "p95": self.percentile(95) * 1000,
+            "p99": self.percentile(99) * 1000,
+        }
+
+
+_histograms = {}
+_histogramsLock = threading.Lock()
+
+
+def record(stage, seconds):
+    """
+    Records the duration of a stage (in the stage's histogram and in the
+    stages of the current request).
+    """
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histogramsLock:
+            histogram = _histograms.setdefault(stage, Histogram())
+    histogram.record(seconds)
+
+    stages = _requestStages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def stats():
+    """
+    Returns a dict from stage to its count, mean, p50, p95 and p99 (in ms).
+    """
+    return {stage: histogram.summary() for stage, histogram in sorted(_histograms.items())}
+
+
+def timed(stage):
+    """
+    Decorator that records the duration of every call of a function as `stage`.
+    When instrumentation is disabled, the function is returned unchanged
+    (no overhead).
+    """
+    def decorator(function):
+        if not enabled():
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class TimingMiddleware:
+    """
+    Records the duration of every request (as "request <url name>") and
+    reports the stages of each request in a Server-Timing header and in
+    the log. Removed by Django when instrumentation is disabled.
+    """
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stages = {}
+        token = _requestStages.set(stages)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _requestStages.reset(token)
+        elapsed = time.perf_counter() - start
+
+        # Record the request under the name of the view's URL
+        match = request.resolver_match
+        record(f"request {match.url_name if match else 'unresolved'}", elapsed)
+
+        # Report the stages of this request (durations in milliseconds)
+        stages["total"] = elapsed
+        response["Server-Timing"] = ", ".join(
+            f"{stage.replace(' ', '_')};dur={seconds * 1000:.3f}" for stage, seconds in stages.items())
+        logger.debug("%s %s %s", request.method, request.path, response["Server-Timing"])
+        return response
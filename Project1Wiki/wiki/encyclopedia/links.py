@@ -0,0 +1,100 @@
+import re
+from urllib.parse import unquote
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import util
+from .models import Link
+from .signals import entries_imported, entry_saved
+from .storage import BATCH_SIZE
+from .titles import TitleIndex
+
+# Links to other entries: [text](/wiki/Title), [name]: /wiki/Title and <a href="/wiki/Title">
+# (up to a sub-path such as /wiki/Title/history, a query or a fragment)
+LINK_RE = re.compile(r"""(?:\]\(|\]:\s*|href=["'])/wiki/([^)\s"'#?/]+)""")
+
+
+def extract_links(content):
+    """
+    Returns the set of entry titles that Markdown content links to.
+    """
+    return {unquote(target) for target in LINK_RE.findall(content)}
+
+
+def _links(title, content):
+    return [Link(source=title, target=target, targetKey=TitleIndex.normalize(target))
+            for target in extract_links(content) if target != title]
+
+
+def update_links(title, content):
+    """
+    Replaces the outgoing links of an entry in the link graph.
+    """
+    with transaction.atomic():
+        Link.objects.filter(source=title).delete()
+        Link.objects.bulk_create(_links(title, content))
+
+
+def update_entries_links(titles):
+    """
+    Replaces the outgoing links of many entries (given their titles)
+    in the link graph, one batch of entries per transaction.
+    """
+    titles = list(titles)
+    for i in range(0, len(titles), BATCH_SIZE):
+        # Read entries and replace their links in batches
+        entries = util.get_entries(titles[i:i + BATCH_SIZE])
+        with transaction.atomic():
+            Link.objects.filter(source__in=entries).delete()
+            Link.objects.bulk_create(
+                [link for title, content in entries.items() for link in _links(title, content)])
+
+
+def rebuild(entries=None):
+    """
+    Rebuilds the link graph from scratch, given an iterable of
+    (title, content) pairs (by default all entries in storage).
+    Returns the number of links.
+    """
+    if entries is None:
+        entries = util.iter_entries()
+
+    count = 0
+    with transaction.atomic():
+        Link.objects.all().delete()
+        for title, content in entries:
+            count += len(Link.objects.bulk_create(_links(title, content)))
+    return count
+
+
+def backlinks(title):
+    """
+    Returns the sorted titles of the entries that link to an entry
+    ("what links here"), in O(degree) through the target index.
+    """
+    return sorted(set(Link.objects.filter(
+        targetKey=TitleIndex.normalize(title)).values_list("source", flat=True)))
+
+
+def broken_links(title=None):
+    """
+    Returns sorted (source, target) pairs of links to entries that do not
+    exist: the links of one entry (O(degree)), or of all entries if title
+    is None (O(number of links), without reading any entry).
+    """
+    links = Link.objects.all() if title is None else Link.objects.filter(source=title)
+    return sorted((source, target) for source, target in links.values_list("source", "target").iterator()
+                  if util.resolve_title(target) is None)
+
+
+@receiver(entry_saved)
+def link_saved_entry(sender, title, content, **kwargs):
+    # Update the outgoing links of the entry incrementally (the rendered HTML of
+    # entries linking to it does not depend on whether it exists, so they are left as is)
+    update_links(title, content)
+
+
+@receiver(entries_imported)
+def link_imported_entries(sender, titles, **kwargs):
+    update_entries_links(titles)
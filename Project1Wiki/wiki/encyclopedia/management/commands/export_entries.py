@@ -0,0 +1,44 @@
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import util
+from encyclopedia.storage import BATCH_SIZE
+
+from .import_entries import open_archive
+
+
+class Command(BaseCommand):
+    help = "Exports all encyclopedia entries to a JSON Lines archive " \
+           '(one {"title": ..., "content": ...} object per line).'
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help='Path of the archive (".gz" for gzip, "-" for stdout).')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        exported = 0
+        try:
+            archive = open_archive(options["archive"], "w")
+        except OSError as e:
+            raise CommandError(e)
+        with archive:
+            titles = iter(util.list_entries())
+            while True:
+                # Read entries in batches and stream them to the archive
+                batch = list(islice(titles, BATCH_SIZE))
+                if not batch:
+                    break
+                entries = util.get_entries(batch)
+                for title in batch:
+                    if title in entries:
+                        archive.write(json.dumps({"title": title, "content": entries[title]}) + "\n")
+                        exported += 1
+        elapsed = time.perf_counter() - start
+
+        # Report on stderr so that exporting to stdout keeps the archive clean
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {exported} entries in {elapsed:.2f}s "
+            f"({exported / elapsed if elapsed else 0:.0f} entries/s)."))
@@ -0,0 +1,58 @@
+import gzip
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import util
+
+
+def open_archive(path, mode):
+    """
+    Opens a JSON Lines archive of entries for reading ("r") or writing ("w"):
+    a file (gzip-compressed if its name ends with ".gz") or "-" for stdin/stdout.
+    """
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Command(BaseCommand):
+    help = "Imports encyclopedia entries from a JSON Lines archive " \
+           '(one {"title": ..., "content": ...} object per line).'
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help='Path of the archive (".gz" for gzip, "-" for stdin).')
+
+    def handle(self, *args, **options):
+        path = options["archive"]
+
+        def read(archive):
+            # Stream entries from the archive, one line at a time
+            for lineNumber, line in enumerate(archive, 1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                    title, content = data["title"], data["content"]
+                except (ValueError, KeyError, TypeError):
+                    raise CommandError(f"{path}:{lineNumber}: expected an object with title and content.")
+                if not title or "/" in title:
+                    raise CommandError(f"{path}:{lineNumber}: invalid title {title!r}.")
+                yield title, content
+
+        start = time.perf_counter()
+        try:
+            archive = open_archive(path, "r")
+        except OSError as e:
+            raise CommandError(e)
+        with archive:
+            titles = util.save_entries(read(archive))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(titles)} entries in {elapsed:.2f}s "
+            f"({len(titles) / elapsed if elapsed else 0:.0f} entries/s)."))
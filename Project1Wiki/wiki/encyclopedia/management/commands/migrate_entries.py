@@ -0,0 +1,37 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from encyclopedia.storage import BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Copies all encyclopedia entries from one storage backend to another " \
+           "(by default from the .md files to the database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default="encyclopedia.storage.FileStorage",
+                            help="Dotted path of the storage backend to read entries from.")
+        parser.add_argument("--target", default="encyclopedia.storage.DatabaseStorage",
+                            help="Dotted path of the storage backend to write entries to.")
+
+    def handle(self, *args, **options):
+        source = import_string(options["source"])()
+        target = import_string(options["target"])()
+
+        start = time.perf_counter()
+        copied = 0
+        titles = iter(sorted(source.list_titles()))
+        while True:
+            # Read and write entries in batches
+            batch = list(islice(titles, BATCH_SIZE))
+            if not batch:
+                break
+            # Count the entries actually written (titles may disappear while copying)
+            copied += sum(1 for _ in target.write_many(source.read_many(batch).items()))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {copied} entries in {time.perf_counter() - start:.2f}s. "
+            f'Set WIKI_STORAGE = "{options["target"]}" to use them.'))
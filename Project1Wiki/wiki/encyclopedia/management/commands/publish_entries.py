@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import publish
+from encyclopedia.pool import RenderPool
+
+
+class Command(BaseCommand):
+    help = "Pre-renders encyclopedia entries into static HTML pages " \
+           "(only entries that changed since they were last published)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=publish.get_root(),
+                            help="Directory to publish to (default: the WIKI_PUBLISH_ROOT setting).")
+        parser.add_argument("--force", action="store_true",
+                            help="Re-render every entry, even if it did not change.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Number of processes converting Markdown (default: number of CPUs).")
+
+    def handle(self, *args, **options):
+        root = options["output"]
+        if not root:
+            raise CommandError("Provide --output or set WIKI_PUBLISH_ROOT.")
+
+        def progress(done):
+            # Report progress on a single line
+            self.stdout.write(f"\rRendered {done} entries...", ending="")
+            self.stdout.flush()
+
+        start = time.perf_counter()
+        with RenderPool(workers=options["workers"], progress=progress) as pool:
+            published, unchanged = publish.publish_all(root, force=options["force"], pool=pool)
+        if published:
+            self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {published} entries ({unchanged} unchanged) to {root} "
+            f"in {time.perf_counter() - start:.2f}s."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from encyclopedia import links
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the graph of links between encyclopedia entries " \
+           "(run it once after migrating a wiki that already has entries, saves and imports keep it up to date)."
+
+    def handle(self, *args, **options):
+        count = links.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Found {count} links."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from encyclopedia import search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index from all encyclopedia entries " \
+           "(run it once after migrating a wiki that already has entries, saves and imports keep it up to date)."
+
+    def handle(self, *args, **options):
+        indexed = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} entries."))
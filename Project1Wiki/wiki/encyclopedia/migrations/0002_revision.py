@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encyclopedia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('number', models.PositiveIntegerField()),
+                ('isSnapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('contentHash', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('title', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encyclopedia', '0003_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Link',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('target', models.CharField(max_length=255)),
+                ('targetKey', models.CharField(db_index=True, max_length=255)),
+            ],
+            options={
+                'unique_together': {('source', 'target')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_documents(apps, schema_editor):
+    # Start the totals from the documents that are already indexed
+    SearchDocument = apps.get_model('encyclopedia', 'SearchDocument')
+    SearchStats = apps.get_model('encyclopedia', 'SearchStats')
+    totals = SearchDocument.objects.aggregate(count=Count('id'), length=Sum('length'))
+    SearchStats.objects.create(id=1, documentCount=totals['count'], totalLength=totals['length'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encyclopedia', '0004_link'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documentCount', models.PositiveIntegerField(default=0)),
+                ('totalLength', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encyclopedia', '0005_searchstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntriesVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,3 +1,105 @@
 from django.db import models
 
-# Create your models here.
+
+# An encyclopedia entry (used by storage.DatabaseStorage)
+class Entry(models.Model):
+    # Define table's columns
+    title = models.CharField(max_length=255, unique=True)
+    content = models.TextField()
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Override __str__ method
+    def __str__(self):
+        return self.title
+
+
+# Number of times entries were added to the Entry table (one row, used by storage.DatabaseStorage
+# to tell when the title index must be reloaded, edits of existing entries do not change it)
+class EntriesVersion(models.Model):
+    # Define table's columns
+    version = models.PositiveBigIntegerField(default=0)
+
+    # Override __str__ method
+    def __str__(self):
+        return f"Entries version {self.version}"
+
+
+# An encyclopedia entry in the full-text search index
+class SearchDocument(models.Model):
+    # Define table's columns
+    title = models.CharField(max_length=255, unique=True)
+    # Number of (weighted) terms in the entry
+    length = models.PositiveIntegerField(default=0)
+
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.title} ({self.length} terms)"
+
+
+# Inverted index: the entries (documents) that contain a term
+class SearchPosting(models.Model):
+    # Define table's columns
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name="postings")
+    # Number of (weighted) occurrences of term in document
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        # (term, document) index serves term lookups and term prefix ranges
+        unique_together = [("term", "document")]
+
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.term} -> {self.document.title} ({self.frequency})"
+
+
+# Totals of the search index for BM25 ranking (one row, updated in the same transaction as the documents)
+class SearchStats(models.Model):
+    # Define table's columns
+    documentCount = models.PositiveIntegerField(default=0)
+    # Sum of the lengths of all documents
+    totalLength = models.PositiveBigIntegerField(default=0)
+
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.documentCount} documents ({self.totalLength} terms)"
+
+
+# A revision of an encyclopedia entry (append-only)
+class Revision(models.Model):
+    # Define table's columns
+    title = models.CharField(max_length=255)
+    # Revisions of an entry are numbered 1, 2, 3, ...
+    number = models.PositiveIntegerField()
+    # Snapshots store the whole content, other revisions a delta against the previous revision
+    isSnapshot = models.BooleanField(default=False)
+    # zlib-compressed content (snapshot) or delta
+    data = models.BinaryField()
+    contentHash = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # (title, number) index serves latest-revision and range lookups
+        unique_together = [("title", "number")]
+
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.title} (revision {self.number})"
+
+
+# A link from one encyclopedia entry to another (adjacency lists of the link graph)
+class Link(models.Model):
+    # Define table's columns
+    source = models.CharField(max_length=255)
+    # Title of the linked entry as written in the link
+    target = models.CharField(max_length=255)
+    # Normalized (casefolded) target, entries resolve titles in any casing
+    targetKey = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        # (source, target) index serves the outgoing links of an entry
+        unique_together = [("source", "target")]
+
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.source} -> {self.target}"
@@ -0,0 +1,94 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from itertools import islice
+
+# This module only depends on markdown2 (not on Django), so that worker
+# processes can import it whatever the process start method is
+import markdown2
+
+# Number of entries sent to a worker process at once
+CHUNK_SIZE = 64
+
+# Number of chunks queued per worker (so a worker that finishes a chunk has the next one at hand)
+CHUNKS_PER_WORKER = 2
+
+
+def _to_html_chunk(entries):
+    # Runs in a worker process
+    return [(key, markdown2.markdown(content)) for key, content in entries]
+
+
+class RenderPool:
+    """
+    Converts Markdown to HTML in a pool of worker processes, for bulk
+    operations (publishing, re-rendering) whose throughput should scale
+    with the number of cores. Work is streamed to the workers in chunks of
+    `chunksize` entries, and `progress(done)` (if given) is called with
+    the number of entries converted so far after each chunk.
+
+    Use it as a context manager:
+
+        with RenderPool() as pool:
+            for title, html in pool.imap(entries):
+                ...
+    """
+
+    def __init__(self, workers=None, chunksize=CHUNK_SIZE, progress=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.progress = progress
+        self.done = 0
+        self._executor = None
+
+    def __enter__(self):
+        # A single worker converts in this process (no pool overhead)
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _report(self, count):
+        self.done += count
+        if self.progress:
+            self.progress(self.done)
+
+    def _results(self, futures):
+        for future in futures:
+            results = future.result()
+            self._report(len(results))
+            yield from results
+
+    def imap(self, entries):
+        """
+        Converts the Markdown contents of an iterable of (key, content)
+        pairs to HTML, and yields (key, html) pairs as soon as their chunk
+        is converted (in no particular order). The iterable is consumed
+        lazily, keeping CHUNKS_PER_WORKER chunks queued per worker, so the
+        caller can read entries and handle results while the workers convert.
+        """
+        entries = iter(entries)
+        chunks = iter(lambda: list(islice(entries, self.chunksize)), [])
+
+        # Convert in this process if there is no pool
+        if self._executor is None:
+            for chunk in chunks:
+                results = _to_html_chunk(chunk)
+                self._report(len(results))
+                yield from results
+            return
+
+        pending = set()
+        for chunk in chunks:
+            pending.add(self._executor.submit(_to_html_chunk, chunk))
+
+            # Hand over the chunks that are done (waiting for one if every worker has enough queued)
+            full = len(pending) >= CHUNKS_PER_WORKER * self.workers
+            done, pending = wait(pending, timeout=None if full else 0, return_when=FIRST_COMPLETED)
+            yield from self._results(done)
+
+        # Hand over the last chunks as they complete
+        yield from self._results(as_completed(pending))
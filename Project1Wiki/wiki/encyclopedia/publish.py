@@ -0,0 +1,140 @@
+import os
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from . import rendering, util
+from .signals import entries_imported, entry_saved
+from .storage import BATCH_SIZE, write_atomically
+
+# Extension of the files that hold the content hash each page was published from
+HASH_EXTENSION = ".sha256"
+
+
+def get_root():
+    """
+    Returns the directory entries are published to (the WIKI_PUBLISH_ROOT
+    setting), or None if publishing is disabled.
+    """
+    return getattr(settings, "WIKI_PUBLISH_ROOT", None)
+
+
+def page_path(root, title):
+    """
+    Returns the path of an entry's static page: <root>/wiki/<title>.html,
+    so a web server can serve /wiki/<title> with e.g. nginx's
+    "try_files $uri.html @django".
+    """
+    return os.path.join(root, "wiki", f"{title}.html")
+
+
+def hash_path(root, title):
+    """
+    Returns the path of the file next to an entry's page that holds the
+    content hash the page was published from: <root>/wiki/<title>.sha256
+    (one file per page, so publishing one entry never rewrites another's).
+    """
+    return os.path.join(root, "wiki", f"{title}{HASH_EXTENSION}")
+
+
+def published_hash(root, title):
+    """
+    Returns the content hash an entry's page was published from, or None
+    if it was never published.
+    """
+    try:
+        with open(hash_path(root, title), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def render_page(title, html):
+    """
+    Renders an entry's page through the same template as the entry view.
+    """
+    return render_to_string("encyclopedia/entry.html", {
+        "title": title,
+        "entry": html
+    })
+
+
+def publish_entry(root, title, content, html=None):
+    """
+    Writes the static page of one entry, then the hash of the content it
+    was published from.
+    """
+    if html is None:
+        html = rendering.entry_html(title, content)
+    _write_page(root, title, html, util.content_hash(content))
+
+
+def _write_page(root, title, html, digest):
+    os.makedirs(os.path.join(root, "wiki"), exist_ok=True)
+    # Replace the page in one step, so the web server never serves a partial page
+    write_atomically(page_path(root, title), render_page(title, html))
+    write_atomically(hash_path(root, title), digest)
+
+
+def publish_all(root, force=False, pool=None):
+    """
+    Publishes every entry whose content changed since it was last published
+    (every entry if force), and removes pages of entries that no longer exist.
+    pool (a pool.RenderPool) may be given to convert Markdown to HTML in
+    worker processes, while this process reads entries and writes each page
+    as soon as it is converted. Returns (number of published pages, number
+    of unchanged pages).
+    """
+    titles = util.list_entries()
+    published = unchanged = 0
+
+    def changed():
+        # Yield the entries that changed (or whose page is missing), reading them in batches
+        nonlocal unchanged
+        for i in range(0, len(titles), BATCH_SIZE):
+            for title, content in util.get_entries(titles[i:i + BATCH_SIZE]).items():
+                digest = util.content_hash(content)
+                if force or published_hash(root, title) != digest or not os.path.exists(page_path(root, title)):
+                    yield (title, digest), content
+                else:
+                    unchanged += 1
+
+    # Convert Markdown content to HTML and write the pages
+    converted = pool.imap(changed()) if pool else \
+        ((key, rendering.to_html(content)) for key, content in changed())
+    for (title, digest), html in converted:
+        _write_page(root, title, html, digest)
+        published += 1
+
+    # Remove pages of entries that no longer exist
+    existing = set(titles)
+    try:
+        filenames = os.listdir(os.path.join(root, "wiki"))
+    except FileNotFoundError:
+        filenames = []
+    for filename in filenames:
+        title = filename[:-len(HASH_EXTENSION)]
+        if filename.endswith(HASH_EXTENSION) and title not in existing:
+            for path in [page_path(root, title), hash_path(root, title)]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    return published, unchanged
+
+
+@receiver(entry_saved)
+def publish_saved_entry(sender, title, content, **kwargs):
+    # Regenerate only the page of the saved entry (and its hash file)
+    root = get_root()
+    if root:
+        publish_entry(root, title, content)
+
+
+@receiver(entries_imported)
+def publish_imported_entries(sender, titles, **kwargs):
+    root = get_root()
+    if root:
+        publish_all(root)
@@ -0,0 +1,62 @@
+import hashlib
+
+import markdown2
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from . import util
+from .instrumentation import timed
+from .signals import entries_imported, entry_saved
+
+
+def _cache():
+    """
+    Returns the Django cache used to store rendered entries
+    (configurable through the WIKI_RENDER_CACHE setting).
+    """
+    return caches[getattr(settings, "WIKI_RENDER_CACHE", "default")]
+
+
+def _key(title):
+    # Hash the title so that any title is a valid cache key
+    return "wiki:html:" + hashlib.sha256(title.encode("utf-8")).hexdigest()
+
+
+@timed("markdown")
+def to_html(content):
+    """
+    Converts Markdown content to HTML (without caching).
+    """
+    return markdown2.markdown(content)
+
+
+def entry_html(title, content):
+    """
+    Converts the Markdown content of an encyclopedia entry to HTML.
+    The rendered HTML is cached per title together with the hash of the
+    content it was rendered from, so unchanged entries are never re-parsed.
+    """
+    digest = util.content_hash(content)
+
+    # Ensure cached HTML was rendered from the same content
+    cached = _cache().get(_key(title))
+    if cached and cached[0] == digest:
+        return cached[1]
+
+    # Convert Markdown content to HTML and cache it
+    html = to_html(content)
+    _cache().set(_key(title), (digest, html), None)
+    return html
+
+
+@receiver(entry_saved)
+def render_saved_entry(sender, title, content, **kwargs):
+    # Write-through: render the new content so the next read is a cache hit
+    _cache().set(_key(title), (util.content_hash(content), to_html(content)), None)
+
+
+@receiver(entries_imported)
+def invalidate_imported_entries(sender, titles, **kwargs):
+    # Render imported entries lazily on their next read
+    _cache().delete_many([_key(title) for title in titles])
@@ -0,0 +1,167 @@
+import difflib
+import json
+import zlib
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+
+from . import util
+from .models import Revision
+from .signals import entries_imported, entry_saved
+from .storage import BATCH_SIZE
+
+# Every SNAPSHOT_INTERVAL-th revision stores the whole content, which bounds
+# the number of deltas applied to rebuild any revision
+SNAPSHOT_INTERVAL = 20
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+
+def make_delta(old, new):
+    """
+    Returns a delta that turns old into new: a list of operations that are
+    either [start, end] (copy these lines of old) or a string (new text).
+    """
+    oldLines = old.splitlines(keepends=True)
+    newLines = new.splitlines(keepends=True)
+    delta = []
+    matcher = difflib.SequenceMatcher(None, oldLines, newLines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j1 != j2:
+            delta.append("".join(newLines[j1:j2]))
+    return delta
+
+
+def apply_delta(old, delta):
+    """
+    Applies a delta returned by make_delta to old.
+    """
+    oldLines = old.splitlines(keepends=True)
+    parts = []
+    for op in delta:
+        if isinstance(op, list):
+            parts.extend(oldLines[op[0]:op[1]])
+        else:
+            parts.append(op)
+    return "".join(parts)
+
+
+def latest(title):
+    """
+    Returns the latest Revision of an entry, or None if it has no history.
+    """
+    return Revision.objects.filter(title=title).order_by("-number").first()
+
+
+def history(title):
+    """
+    Returns the revisions of an entry, newest first (without their data).
+    """
+    return Revision.objects.filter(title=title).order_by("-number").defer("data")
+
+
+def get_content(title, number):
+    """
+    Returns the content of an entry at a given revision, or None if there
+    is no such revision.
+    """
+    # Start from the nearest snapshot and apply the deltas that follow it
+    snapshot = Revision.objects.filter(
+        title=title, number__lte=number, isSnapshot=True).order_by("-number").first()
+    if snapshot is None:
+        return None
+    deltas = list(Revision.objects.filter(
+        title=title, number__gt=snapshot.number, number__lte=number).order_by("number"))
+
+    # Ensure the requested revision exists
+    if (deltas[-1].number if deltas else snapshot.number) != number:
+        return None
+
+    content = _unpack(snapshot.data)
+    for revision in deltas:
+        content = apply_delta(content, _unpack(revision.data))
+    return content
+
+
+def _append(title, number, content, base):
+    # Store a snapshot every SNAPSHOT_INTERVAL revisions (and for the first one)
+    isSnapshot = base is None or number % SNAPSHOT_INTERVAL == 1
+    return Revision.objects.create(
+        title=title,
+        number=number,
+        isSnapshot=isSnapshot,
+        data=_pack(content if isSnapshot else make_delta(base, content)),
+        contentHash=util.content_hash(content))
+
+
+def record(title, content, previous=None):
+    """
+    Appends content as the newest revision of an entry. previous is the
+    content it replaced, which is recorded first if the entry has no
+    history yet. Returns the newest Revision.
+    """
+    with transaction.atomic():
+        last = latest(title)
+
+        # Keep the version that existed before history was tracked
+        if last is None and previous is not None and previous != content:
+            last = _append(title, 1, previous, None)
+
+        # Nothing to record if the content did not change
+        digest = util.content_hash(content)
+        if last is not None and last.contentHash == digest:
+            return last
+
+        if last is None:
+            return _append(title, 1, content, None)
+
+        # Get the content of the last revision (usually the content that was just replaced)
+        if previous is not None and util.content_hash(previous) == last.contentHash:
+            base = previous
+        else:
+            base = get_content(title, last.number)
+        return _append(title, last.number + 1, content, base)
+
+
+def record_entries(titles):
+    """
+    Appends the current content of many entries (given their titles) as
+    their newest revisions, unless it did not change. The new revisions
+    are snapshots, so no earlier revision is read to compute a delta.
+    """
+    titles = list(titles)
+    for i in range(0, len(titles), BATCH_SIZE):
+        # Read entries and the latest revision of each of them in batches
+        entries = util.get_entries(titles[i:i + BATCH_SIZE])
+        newest = Revision.objects.filter(title=OuterRef("title")).order_by("-number").values("number")[:1]
+        with transaction.atomic():
+            latest = {title: (number, digest) for title, number, digest in Revision.objects.filter(
+                title__in=entries, number=Subquery(newest)).values_list("title", "number", "contentHash")}
+            revisions = []
+            for title, content in entries.items():
+                number, lastDigest = latest.get(title, (0, None))
+                digest = util.content_hash(content)
+                if digest != lastDigest:
+                    revisions.append(Revision(title=title, number=number + 1, isSnapshot=True,
+                                              data=_pack(content), contentHash=digest))
+            Revision.objects.bulk_create(revisions)
+
+
+@receiver(entry_saved)
+def record_saved_entry(sender, title, content, previous=None, **kwargs):
+    record(title, content, previous)
+
+
+@receiver(entries_imported)
+def record_imported_entries(sender, titles, **kwargs):
+    # Give imported entries a base revision (history, diff and restore start from it)
+    record_entries(titles)
@@ -0,0 +1,189 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.dispatch import receiver
+
+from . import util
+from .models import SearchDocument, SearchPosting, SearchStats
+from .storage import BATCH_SIZE
+from .signals import entries_imported, entry_saved
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Occurrences of a term in an entry's title count as this many occurrences
+TITLE_WEIGHT = 3
+
+# Longest term stored in the index (SearchPosting.term max_length)
+MAX_TERM_LENGTH = 64
+
+# Shortest last term of a query that also matches as a prefix (shorter prefixes
+# would match a large part of the vocabulary)
+MIN_PREFIX_LENGTH = 3
+
+# Id of the SearchStats row
+STATS_ID = 1
+
+
+def tokenize(text):
+    """
+    Splits text into normalized terms (lowercased, without accents).
+    """
+    # Strip accents (e.g. "café" -> "cafe")
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [term[:MAX_TERM_LENGTH] for term in re.findall(r"\w+", text)]
+
+
+def _terms(title, content):
+    # Count terms of the entry, giving extra weight to the title
+    counts = Counter(tokenize(content))
+    for term in tokenize(title):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+def _postings(document, counts):
+    return [SearchPosting(term=term, document=document, frequency=frequency)
+            for term, frequency in counts.items()]
+
+
+def _update_stats(documents, length):
+    # Add to the document count and total length (in the caller's transaction, so
+    # every process ranks with the totals of the committed index)
+    updated = SearchStats.objects.filter(id=STATS_ID).update(
+        documentCount=F("documentCount") + documents, totalLength=F("totalLength") + length)
+    if not updated:
+        _recount_stats()
+
+
+def _recount_stats():
+    # Recompute the totals from the documents
+    totals = SearchDocument.objects.aggregate(count=Count("id"), length=Sum("length"))
+    SearchStats.objects.update_or_create(id=STATS_ID, defaults={
+        "documentCount": totals["count"], "totalLength": totals["length"] or 0})
+
+
+def index_entry(title, content):
+    """
+    Adds an encyclopedia entry to the search index, replacing any
+    previously indexed version of it.
+    """
+    counts = _terms(title, content)
+    length = sum(counts.values())
+    with transaction.atomic():
+        document = SearchDocument.objects.filter(title=title).first()
+        if document is None:
+            document = SearchDocument.objects.create(title=title, length=length)
+            _update_stats(1, length)
+        else:
+            _update_stats(0, length - document.length)
+            document.length = length
+            document.save(update_fields=["length"])
+            document.postings.all().delete()
+        SearchPosting.objects.bulk_create(_postings(document, counts))
+
+
+def index_entries(titles):
+    """
+    Adds many encyclopedia entries (given their titles) to the search
+    index, replacing any previously indexed versions of them.
+    """
+    titles = list(titles)
+    for i in range(0, len(titles), BATCH_SIZE):
+        # Read and index entries in batches
+        counts = {title: _terms(title, content)
+                  for title, content in util.get_entries(titles[i:i + BATCH_SIZE]).items()}
+        with transaction.atomic():
+            replaced = SearchDocument.objects.filter(title__in=counts).aggregate(count=Count("id"), length=Sum("length"))
+            SearchDocument.objects.filter(title__in=counts).delete()
+            documents = SearchDocument.objects.bulk_create(
+                [SearchDocument(title=title, length=sum(terms.values())) for title, terms in counts.items()])
+            SearchPosting.objects.bulk_create(
+                [posting for document in documents for posting in _postings(document, counts[document.title])])
+            _update_stats(len(documents) - replaced["count"],
+                          sum(document.length for document in documents) - (replaced["length"] or 0))
+
+
+def rebuild(entries=None):
+    """
+    Rebuilds the search index from scratch, given an iterable of
+    (title, content) pairs (by default all entries in storage).
+    Returns the number of indexed entries.
+    """
+    if entries is None:
+        entries = util.iter_entries()
+
+    indexed = 0
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for title, content in entries:
+            counts = _terms(title, content)
+            document = SearchDocument.objects.create(title=title, length=sum(counts.values()))
+            SearchPosting.objects.bulk_create(_postings(document, counts))
+            indexed += 1
+        _recount_stats()
+    return indexed
+
+
+def _stats():
+    # Get the number of documents and their average length (one row, kept up to date by the index updates)
+    stats = SearchStats.objects.filter(id=STATS_ID).values_list("documentCount", "totalLength").first()
+    count, totalLength = stats or (0, 0)
+    return count, totalLength / count if count else 0
+
+
+def search(query):
+    """
+    Returns the titles of the entries that match query, best match first
+    (ranked with BM25). The last term of query also matches as a prefix
+    if it has at least MIN_PREFIX_LENGTH characters, so partial words such
+    as "pyth" find "Python".
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    # Get postings of the complete terms and of the terms starting with the last term
+    # (a range on the term index rather than LIKE, so that the index is used)
+    *complete, last = terms
+    if len(last) < MIN_PREFIX_LENGTH:
+        complete.append(last)
+        postings = SearchPosting.objects.filter(term__in=complete)
+    else:
+        postings = SearchPosting.objects.filter(term__in=complete) | SearchPosting.objects.filter(
+            term__gte=last, term__lt=last + "\U0010ffff")
+    postings = postings.values_list("term", "document__title", "document__length", "frequency")
+
+    # Group postings by term
+    byTerm = {}
+    for term, title, length, frequency in postings:
+        byTerm.setdefault(term, []).append((title, length, frequency))
+
+    # Score documents with BM25
+    count, avgLength = _stats()
+    scores = Counter()
+    for term, matches in byTerm.items():
+        idf = math.log(1 + (count - len(matches) + 0.5) / (len(matches) + 0.5))
+        for title, length, frequency in matches:
+            norm = K1 * (1 - B + B * length / avgLength) if avgLength else K1
+            scores[title] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+    # Sort by score (then by title for a stable order)
+    return sorted(scores, key=lambda title: (-scores[title], title))
+
+
+@receiver(entry_saved)
+def index_saved_entry(sender, title, content, **kwargs):
+    # Keep the index up to date incrementally
+    index_entry(title, content)
+
+
+@receiver(entries_imported)
+def index_imported_entries(sender, titles, **kwargs):
+    index_entries(titles)
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+
+# Sent by util.save_entry after an entry has been written to storage
+# (keyword arguments: title, content, previous -- the replaced content or None)
+entry_saved = Signal()
+
+# Sent by util.save_entries once after a bulk write of entries
+# (keyword arguments: titles -- the titles of all written entries)
+entries_imported = Signal()
@@ -0,0 +1,42 @@
+// Suggest entries' titles in the search box while the user types
+document.addEventListener('DOMContentLoaded', () => {
+  const input = document.querySelector('input[data-autocomplete-url]');
+  const datalist = document.querySelector('#entriesTitles');
+  let timer = null;
+  let controller = null;
+
+  input.addEventListener('input', () => {
+    // Wait until the user pauses typing
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      const query = input.value.trim();
+      if (!query) {
+        datalist.innerHTML = '';
+        return;
+      }
+
+      // Cancel the previous (now outdated) request
+      if (controller) {
+        controller.abort();
+      }
+      controller = new AbortController();
+
+      fetch(`${input.dataset.autocompleteUrl}?q=${encodeURIComponent(query)}`, {signal: controller.signal})
+      .then(response => response.json())
+      .then(data => {
+        // Replace suggestions with the titles that match
+        datalist.innerHTML = '';
+        data.titles.forEach(title => {
+          const option = document.createElement('option');
+          option.value = title;
+          datalist.append(option);
+        });
+      })
+      .catch(error => {
+        if (error.name !== 'AbortError') {
+          console.log(error);
+        }
+      });
+    }, 100);
+  });
+});
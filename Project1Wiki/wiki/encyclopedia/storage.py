@@ -0,0 +1,214 @@
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import EntriesVersion, Entry
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Number of entries read or written per query by the bulk operations
+BATCH_SIZE = 500
+
+
+def write_atomically(path, content):
+    """
+    Writes text content to path through a temporary file in the same
+    directory that is renamed over path, so readers see either the old or
+    the new file and never a missing or partially written one.
+    """
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmpPath, default_storage.file_permissions_mode or 0o644)
+        os.replace(tmpPath, path)
+    except BaseException:
+        os.unlink(tmpPath)
+        raise
+
+
+class FileStorage:
+    """
+    Stores each encyclopedia entry as a Markdown file "entries/<title>.md"
+    in Django's default file storage.
+    """
+
+    def _filename(self, title):
+        return f"entries/{title}.md"
+
+    def _path(self, name):
+        # Get the local path of a file, or None if the storage is not local
+        try:
+            return default_storage.path(name)
+        except NotImplementedError:
+            return None
+
+    def list_titles(self):
+        """
+        Returns an iterable of the titles of all entries.
+        """
+        _, filenames = default_storage.listdir("entries")
+        return (re.sub(r"\.md$", "", filename)
+                for filename in filenames if filename.endswith(".md"))
+
+    def version(self):
+        """
+        Returns a value that changes whenever entries are added or removed
+        (the mtime of the entries directory), or None if it is unknown.
+        """
+        path = self._path("entries")
+        try:
+            return os.stat(path).st_mtime_ns if path else None
+        except FileNotFoundError:
+            return None
+
+    def read(self, title):
+        """
+        Returns the content of an entry, or None if there is no such entry.
+        """
+        try:
+            with default_storage.open(self._filename(title)) as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def modified(self, title):
+        """
+        Returns the time an entry was last modified, or None if there is no
+        such entry (or the storage does not know).
+        """
+        try:
+            return default_storage.get_modified_time(self._filename(title))
+        except (FileNotFoundError, NotImplementedError):
+            return None
+
+    def read_many(self, titles):
+        """
+        Returns a dict from title to content for the given titles
+        (titles that do not exist are left out).
+        """
+        entries = {}
+        for title in titles:
+            content = self.read(title)
+            if content is not None:
+                entries[title] = content
+        return entries
+
+    @contextmanager
+    def lock(self, title):
+        """
+        Holds an exclusive lock for writing (across processes, when the
+        storage is on the local filesystem).
+        """
+        path = self._path("entries/.lock")
+        if fcntl is None or path is None:
+            yield
+            return
+        with open(path, "a") as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def write(self, title, content):
+        """
+        Creates or replaces an entry.
+        """
+        filename = self._filename(title)
+        path = self._path(filename)
+        if path:
+            # Replace the file in one step (no window where it is missing)
+            write_atomically(path, content)
+        else:
+            # Storage without local paths can only replace the file in two steps
+            if default_storage.exists(filename):
+                default_storage.delete(filename)
+            default_storage.save(filename, ContentFile(content))
+
+    def write_many(self, entries):
+        """
+        Creates or replaces the entries of an iterable of (title, content) pairs.
+        A generator: yields the title of each entry once it is written.
+        """
+        for title, content in entries:
+            self.write(title, content)
+            yield title
+
+
+class DatabaseStorage:
+    """
+    Stores encyclopedia entries as rows of the Entry model, i.e. in the
+    project's database (SQLite by default), with an index on the title.
+    """
+
+    def list_titles(self):
+        return Entry.objects.values_list("title", flat=True).iterator()
+
+    # Id of the EntriesVersion row
+    VERSION_ID = 1
+
+    def version(self):
+        # Counter of added entries (edits do not change it, so they do not reload the title index)
+        return EntriesVersion.objects.filter(id=self.VERSION_ID).values_list("version", flat=True).first() or 0
+
+    def _entries_added(self):
+        # Bump the counter (in the caller's transaction)
+        if not EntriesVersion.objects.filter(id=self.VERSION_ID).update(version=F("version") + 1):
+            EntriesVersion.objects.create(id=self.VERSION_ID, version=1)
+
+    def read(self, title):
+        return Entry.objects.filter(title=title).values_list("content", flat=True).first()
+
+    def modified(self, title):
+        return Entry.objects.filter(title=title).values_list("modified", flat=True).first()
+
+    def read_many(self, titles):
+        titles = list(titles)
+        entries = {}
+        for i in range(0, len(titles), BATCH_SIZE):
+            entries.update(Entry.objects.filter(
+                title__in=titles[i:i + BATCH_SIZE]).values_list("title", "content"))
+        return entries
+
+    @contextmanager
+    def lock(self, title):
+        # Lock the entry's row (if any) until the end of the transaction
+        with transaction.atomic():
+            list(Entry.objects.select_for_update().filter(title=title).values_list("id"))
+            yield
+
+    def write(self, title, content):
+        with transaction.atomic():
+            _, created = Entry.objects.update_or_create(title=title, defaults={"content": content})
+            if created:
+                self._entries_added()
+
+    def write_many(self, entries):
+        entries = iter(entries)
+        while True:
+            batch = [Entry(title=title, content=content)
+                     for title, content in islice(entries, BATCH_SIZE)]
+            if not batch:
+                break
+            # Insert new entries and update existing ones in one query per batch
+            with transaction.atomic():
+                titles = {entry.title for entry in batch}
+                existing = set(Entry.objects.filter(title__in=titles).values_list("title", flat=True))
+                Entry.objects.bulk_create(batch, update_conflicts=True, unique_fields=["title"],
+                                          update_fields=["content", "modified"])
+                if titles - existing:
+                    self._entries_added()
+            yield from (entry.title for entry in batch)
@@ -1,3 +1,299 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import links, publish, revisions, search_index, util
+from .models import Entry, Revision, SearchDocument, SearchStats
+from .pool import RenderPool
+from .storage import DatabaseStorage
+
+
+class EntriesTestCase(TestCase):
+    """
+    Keeps the entries of each test in a temporary directory (the default
+    storage's MEDIA_ROOT) and starts with an empty title index.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        os.mkdir(os.path.join(self.directory, "entries"))
+        settings = override_settings(MEDIA_ROOT=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        util._titles.invalidate()
+        self.addCleanup(util._titles.invalidate)
+
+
+class SearchIndexTests(EntriesTestCase):
+    def assertStats(self):
+        # Ensure the stored totals match the indexed documents
+        stats = SearchStats.objects.get(id=search_index.STATS_ID)
+        self.assertEqual(stats.documentCount, SearchDocument.objects.count())
+        self.assertEqual(stats.totalLength, sum(SearchDocument.objects.values_list("length", flat=True)))
+
+    def test_stats_follow_saves_and_imports(self):
+        util.save_entry("Python", "Python is a programming language.")
+        self.assertStats()
+        util.save_entry("Python", "Python is a language.")
+        self.assertStats()
+        util.save_entries([("Git", "Git is a version control system."), ("Python", "Python.")])
+        self.assertStats()
+        self.assertEqual(search_index.rebuild(), 2)
+        self.assertStats()
+
+    def test_search_ranks_title_matches_first(self):
+        util.save_entry("Python", "Python is a programming language.")
+        util.save_entry("Django", "Django is a web framework written in Python.")
+        util.save_entry("Git", "Git is a version control system.")
+        self.assertEqual(search_index.search("python"), ["Python", "Django"])
+        self.assertEqual(search_index.search("version control"), ["Git"])
+
+    def test_search_expands_only_long_prefixes(self):
+        util.save_entry("Python", "Python is a programming language.")
+        util.save_entry("Perl", "Perl is a programming language.")
+        self.assertEqual(search_index.search("pyt"), ["Python"])
+        self.assertEqual(search_index.search("language per"), ["Perl", "Python"])
+        # Short last terms only match whole terms
+        self.assertEqual(search_index.search("pe"), [])
+        self.assertEqual(search_index.search("p"), [])
+        self.assertEqual(search_index.search("language is"), ["Perl", "Python"])
+
+
+class SaveEntryTests(EntriesTestCase):
+    def test_stale_hash_conflicts(self):
+        util.save_entry("Python", "First version.")
+        firstHash = util.content_hash("First version.")
+        util.save_entry("Python", "Second version.", expected_hash=firstHash)
+        # Ensure a save based on the first version no longer goes through
+        with self.assertRaises(util.EntryConflict):
+            util.save_entry("Python", "Third version.", expected_hash=firstHash)
+        self.assertEqual(util.get_entry("Python"), "Second version.")
+        # An expected hash for an entry that does not exist is a conflict too
+        with self.assertRaises(util.EntryConflict):
+            util.save_entry("Git", "Git.", expected_hash=firstHash)
+
+    def test_saving_a_stale_edit_is_a_conflict(self):
+        util.save_entry("Python", "First version.")
+        firstHash = util.content_hash("First version.")
+        util.save_entry("Python", "Second version.")
+        response = self.client.post(reverse("wiki:saveEditedPage"), {
+            "title": "Python", "MDContent": "My version.", "contentHash": firstHash})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(util.get_entry("Python"), "Second version.")
+        # The form keeps the user's content, based on the latest version
+        self.assertEqual(response.context["Form"].initial["MDContent"], "My version.")
+        self.assertEqual(response.context["Form"].initial["contentHash"], util.content_hash("Second version."))
+
+        # Saving again replaces the latest version
+        response = self.client.post(reverse("wiki:saveEditedPage"), {
+            "title": "Python", "MDContent": "My version.", "contentHash": util.content_hash("Second version.")})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(util.get_entry("Python"), "My version.")
+
+    def test_readers_never_see_a_missing_or_partial_entry(self):
+        contents = ["Short.", "A much longer version of the entry. " * 200]
+        util.save_entry("Python", contents[0])
+        seen = []
+        stop = threading.Event()
+
+        def read():
+            # Read the entry file over and over while it is being replaced
+            storage = util.get_storage()
+            while not stop.is_set():
+                seen.append(storage.read("Python"))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for i in range(50):
+                util.save_entry("Python", contents[i % 2])
+        finally:
+            stop.set()
+            reader.join()
+        self.assertTrue(seen)
+        self.assertEqual(set(seen) - set(contents), set())
+
+
+class RevisionTests(EntriesTestCase):
+    def test_delta_round_trips(self):
+        texts = ["", "One line", "One line\n", "a\nb\nc\n", "a\nB\nc\nd", "c\nb\na\n", "\n\n\n", "x\r\ny\r\n"]
+        for old in texts:
+            for new in texts:
+                self.assertEqual(revisions.apply_delta(old, revisions.make_delta(old, new)), new, (old, new))
+
+    def test_delta_copies_unchanged_lines(self):
+        old = "".join(f"Line {i}\n" for i in range(100))
+        new = old.replace("Line 50\n", "Changed line\n")
+        self.assertEqual(revisions.make_delta(old, new), [[0, 50], "Changed line\n", [51, 100]])
+
+    def test_content_at_every_revision(self):
+        # More revisions than SNAPSHOT_INTERVAL, so some are rebuilt from a later snapshot
+        contents = [f"# Python\n\nVersion {i}.\n" + "Unchanged line.\n" * i for i in range(revisions.SNAPSHOT_INTERVAL + 5)]
+        for content in contents:
+            util.save_entry("Python", content)
+        self.assertEqual(revisions.latest("Python").number, len(contents))
+        for number, content in enumerate(contents, 1):
+            self.assertEqual(revisions.get_content("Python", number), content, number)
+        self.assertIsNone(revisions.get_content("Python", len(contents) + 1))
+        self.assertIsNone(revisions.get_content("Python", 0))
+        self.assertIsNone(revisions.get_content("Git", 1))
+
+    def test_restore(self):
+        for content in ["First.", "Second.", "Third."]:
+            util.save_entry("Python", content)
+        response = self.client.post(reverse("wiki:restoreRevision"), {"title": "Python", "number": "1"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(util.get_entry("Python"), "First.")
+        # Restoring adds a revision, the history is kept
+        self.assertEqual([revision.number for revision in revisions.history("Python")], [4, 3, 2, 1])
+        self.assertEqual(revisions.get_content("Python", 4), "First.")
+        self.assertEqual(self.client.post(reverse("wiki:restoreRevision"), {"title": "Python", "number": "9"}).status_code, 404)
+
+    def test_imported_entries_get_a_revision(self):
+        util.save_entry("Python", "Saved.")
+        util.save_entries([("Python", "Imported."), ("Git", "Imported.")])
+        self.assertEqual(revisions.get_content("Python", 2), "Imported.")
+        self.assertEqual(revisions.get_content("Git", 1), "Imported.")
+        # Importing the same content again adds nothing
+        util.save_entries([("Python", "Imported."), ("Git", "Imported.")])
+        self.assertEqual(Revision.objects.count(), 3)
+        # Later saves continue the history
+        util.save_entry("Git", "Edited.")
+        self.assertEqual(revisions.get_content("Git", 2), "Edited.")
+        self.assertEqual(self.client.get(reverse("wiki:diff", args=["Git"])).status_code, 200)
+
+
+class ImportTests(EntriesTestCase):
+    def write_archive(self, lines):
+        path = os.path.join(self.directory, "archive.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_failed_import_updates_indexes_of_written_entries(self):
+        path = self.write_archive([
+            json.dumps({"title": "Alpha", "content": "Alpha links to [Beta](/wiki/Beta)."}),
+            json.dumps({"title": "Beta", "content": "Beta is the second letter."}),
+            "not json",
+            json.dumps({"title": "Gamma", "content": "Gamma."}),
+        ])
+        with self.assertRaises(CommandError):
+            call_command("import_entries", path, stdout=StringIO())
+
+        # The entries written before the error are listed, indexed, linked and have history
+        self.assertEqual(util.list_entries(), ["Alpha", "Beta"])
+        self.assertEqual(search_index.search("alpha"), ["Alpha"])
+        self.assertEqual(links.backlinks("Beta"), ["Alpha"])
+        self.assertEqual(revisions.get_content("Alpha", 1), "Alpha links to [Beta](/wiki/Beta).")
+
+    def test_migrate_reports_copied_entries(self):
+        util.save_entries([("Alpha", "Alpha."), ("Beta", "Beta.")])
+        out = StringIO()
+        call_command("migrate_entries", stdout=out)
+        self.assertIn("Copied 2 entries", out.getvalue())
+        self.assertEqual(dict(Entry.objects.values_list("title", "content")), {"Alpha": "Alpha.", "Beta": "Beta."})
+
+
+@override_settings(WIKI_STORAGE="encyclopedia.storage.DatabaseStorage")
+class DatabaseStorageTests(EntriesTestCase):
+    def setUp(self):
+        super().setUp()
+        util.get_storage.cache_clear()
+        self.addCleanup(util.get_storage.cache_clear)
+
+    def test_only_added_entries_change_the_version(self):
+        storage = DatabaseStorage()
+        util.save_entry("Python", "Python.")
+        version = storage.version()
+        util.save_entry("Python", "Python, edited.")
+        util.save_entries([("Python", "Python, imported.")])
+        self.assertEqual(storage.version(), version)
+        util.save_entry("Git", "Git.")
+        self.assertEqual(storage.version(), version + 1)
+        util.save_entries([("Git", "Git, imported."), ("Django", "Django.")])
+        self.assertEqual(storage.version(), version + 2)
+        self.assertEqual(util.list_entries(), ["Django", "Git", "Python"])
+
+    def test_title_reads_do_not_query_the_database(self):
+        util.save_entry("Python", "Python.")
+        util.list_entries()
+        with self.assertNumQueries(0):
+            self.assertEqual(util.list_entries(), ["Python"])
+            self.assertEqual(util.resolve_title("python"), "Python")
+            self.assertEqual(util.complete_title("py"), ["Python"])
+            self.assertTrue(util.entry_exists("Python"))
+
+    def test_entry_page_reads_the_entry_once(self):
+        util.save_entry("Python", "# Python\n\nA language.")
+        util.list_entries()
+        # One query for the content and one for the modification time
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("wiki:title", args=["python"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["title"], "Python")
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("wiki:title", args=["python"]), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+class PublishTests(EntriesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.directory, "public")
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_publish_only_changed_entries(self):
+        util.save_entries([("Python", "# Python"), ("Git", "# Git")])
+        self.assertEqual(publish.publish_all(self.root), (2, 0))
+        self.assertEqual(publish.published_hash(self.root, "Python"), util.content_hash("# Python"))
+        self.assertIn("<h1>Python</h1>", self.read(publish.page_path(self.root, "Python")))
+        self.assertEqual(publish.publish_all(self.root), (0, 2))
+        self.assertEqual(publish.publish_all(self.root, force=True), (2, 0))
+
+        # Ensure saves republish the entry's page (and only it)
+        with override_settings(WIKI_PUBLISH_ROOT=self.root):
+            util.save_entry("Git", "# Git, edited")
+        self.assertIn("Git, edited", self.read(publish.page_path(self.root, "Git")))
+        self.assertEqual(publish.publish_all(self.root), (0, 2))
+
+    def test_publish_removes_pages_of_missing_entries(self):
+        util.save_entries([("Python", "# Python")])
+        publish.publish_entry(self.root, "Gone", "# Gone")
+        self.assertEqual(publish.publish_all(self.root), (1, 0))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "wiki"))), ["Python.html", "Python.sha256"])
+
+    def test_publish_through_a_pool(self):
+        entries = [(f"Entry {i}", f"# Entry {i}\n\nText of entry {i}.") for i in range(25)]
+        util.save_entries(entries)
+        done = []
+        with RenderPool(workers=3, chunksize=2, progress=done.append) as pool:
+            self.assertEqual(publish.publish_all(self.root, pool=pool), (25, 0))
+        self.assertEqual(done[-1], 25)
+        for title, content in entries:
+            self.assertIn(f"<p>Text of {title.lower()}.</p>", self.read(publish.page_path(self.root, title)))
+            self.assertEqual(publish.published_hash(self.root, title), util.content_hash(content))
+
+
+class LinkTests(EntriesTestCase):
+    def test_extract_links(self):
+        content = ("[CSS](/wiki/CSS), [history](/wiki/HTML/history), [q](/wiki/Git?x=1), [f](/wiki/Python#top)\n"
+                   "[ref]: /wiki/Django\n<a href=\"/wiki/New%20Page\">new</a> [out](https://example.com/wiki/No)")
+        self.assertEqual(links.extract_links(content), {"CSS", "HTML", "Git", "Python", "Django", "New Page"})
+
+    def test_backlinks_and_broken_links(self):
+        util.save_entry("CSS", "See the [history](/wiki/HTML/history) of [HTML](/wiki/html).")
+        util.save_entry("HTML", "HTML.")
+        util.save_entry("Git", "[Missing](/wiki/Missing/backlinks)")
+        self.assertEqual(links.backlinks("HTML"), ["CSS"])
+        self.assertEqual(links.broken_links(), [("Git", "Missing")])
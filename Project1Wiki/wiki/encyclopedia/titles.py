@@ -0,0 +1,164 @@
+import bisect
+import random
+import threading
+import time
+
+
+class TitleIndex:
+    """
+    A process-wide, sorted index of encyclopedia entry titles.
+
+    The index is loaded once through `load` (a function returning an iterable
+    of titles) and then kept in memory. On reads `version` (a function
+    returning e.g. the mtime of the entries directory, or None if unknown) is
+    compared with the version seen at load time, at most once every `ttl`
+    seconds, and the index is reloaded when they differ. Writers can keep the
+    index up to date incrementally through `add()`, or force a reload through
+    `invalidate()`.
+
+    Alongside the sorted titles the index keeps a table from normalized
+    (casefolded) titles to titles, so any casing resolves in one lookup,
+    and a sorted list of (normalized title, title) pairs for case-insensitive
+    prefix completion.
+    """
+
+    def __init__(self, load, version, ttl=0):
+        self._load = load
+        self._version = version
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # (sorted titles, normalized title -> title, sorted (normalized title, title)),
+        # swapped as a whole
+        self._state = None
+        self._loadedVersion = None
+        # When the version was last compared (time.monotonic())
+        self._checked = None
+
+    @staticmethod
+    def normalize(title):
+        """
+        Returns the key under which a title is stored in the resolution table.
+        """
+        return title.casefold()
+
+    def _build(self, titles):
+        # Map normalized titles to titles (the first title wins on collisions)
+        byKey = {}
+        for title in titles:
+            byKey.setdefault(self.normalize(title), title)
+        keys = sorted((self.normalize(title), title) for title in titles)
+        return (titles, byKey, keys)
+
+    def _stale(self, version):
+        return self._state is None or (version is not None and version != self._loadedVersion)
+
+    def _current(self):
+        # Skip the version check if the loaded index was checked less than ttl seconds ago
+        state = self._state
+        now = time.monotonic()
+        if state is not None and self._checked is not None and now - self._checked < self._ttl:
+            return state
+
+        # Get the version of the underlying storage
+        version = self._version()
+        self._checked = now
+
+        # Ensure index is loaded and still fresh
+        if self._stale(version):
+            with self._lock:
+                # Another thread may have reloaded the index in the meantime
+                if self._stale(version):
+                    self._state = self._build(sorted(set(self._load())))
+                    self._loadedVersion = version
+                state = self._state
+        return state
+
+    def titles(self):
+        """
+        Returns the sorted list of all titles. The returned list is shared,
+        so callers must not modify it.
+        """
+        return self._current()[0]
+
+    def __len__(self):
+        return len(self._current()[0])
+
+    def __contains__(self, title):
+        # Binary search the sorted titles (O(log n))
+        titles = self._current()[0]
+        i = bisect.bisect_left(titles, title)
+        return i < len(titles) and titles[i] == title
+
+    def resolve(self, title):
+        """
+        Returns the title of the entry that matches `title` in any casing
+        (an exact match is preferred), or None if there is no such entry.
+        """
+        titles, byKey, _ = self._current()
+        i = bisect.bisect_left(titles, title)
+        if i < len(titles) and titles[i] == title:
+            return title
+        return byKey.get(self.normalize(title))
+
+    def random(self):
+        """
+        Returns a random title (constant time), or None if there are none.
+        """
+        titles = self._current()[0]
+        return random.choice(titles) if titles else None
+
+    def complete(self, prefix, limit):
+        """
+        Returns up to `limit` titles that start with `prefix` in any casing,
+        in order of their normalized titles (O(log n + limit)).
+        """
+        keys = self._current()[2]
+        prefix = self.normalize(prefix)
+        completions = []
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and len(completions) < limit and keys[i][0].startswith(prefix):
+            completions.append(keys[i][1])
+            i += 1
+        return completions
+
+    def prefix(self, prefix):
+        """
+        Returns the sorted titles that start with `prefix` (case-sensitive).
+        """
+        titles = self._current()[0]
+        start = bisect.bisect_left(titles, prefix)
+        end = start
+        while end < len(titles) and titles[end].startswith(prefix):
+            end += 1
+        return titles[start:end]
+
+    def add(self, title):
+        """
+        Adds a title to a loaded index without reloading it from storage.
+        """
+        with self._lock:
+            # Nothing to update if the index is not loaded yet
+            if self._state is None:
+                return
+
+            # Copy-on-write so that readers holding the old state are unaffected
+            titles, byKey, keys = self._state
+            i = bisect.bisect_left(titles, title)
+            if i == len(titles) or titles[i] != title:
+                byKey = dict(byKey)
+                byKey.setdefault(self.normalize(title), title)
+                key = (self.normalize(title), title)
+                j = bisect.bisect_left(keys, key)
+                self._state = (titles[:i] + [title] + titles[i:], byKey, keys[:j] + [key] + keys[j:])
+
+            # The write changed the storage version, remember the new one
+            self._loadedVersion = self._version()
+
+    def invalidate(self):
+        """
+        Drops the loaded index so that the next read reloads it.
+        """
+        with self._lock:
+            self._state = None
+            self._loadedVersion = None
+            self._checked = None
@@ -6,9 +6,16 @@ app_name = "wiki"
 urlpatterns = [
     path("", views.index, name="index"),
     path("wiki/search", views.search, name="search"),
+    path("wiki/autocomplete", views.autocomplete, name="autocomplete"),
     path("wiki/newPage", views.newPage, name="newPage"),
     path("wiki/editPage", views.editPage, name="editPage"),
     path("wiki/saveEditedPage", views.saveEditedPage, name="saveEditedPage"),
     path("wiki/randomPage", views.randomPage, name="randomPage"),
+    path("wiki/restoreRevision", views.restoreRevision, name="restoreRevision"),
+    path("wiki/brokenLinks", views.brokenLinks, name="brokenLinks"),
+    path("wiki/stats", views.stats, name="stats"),
+    path("wiki/<str:title>/history", views.history, name="history"),
+    path("wiki/<str:title>/diff", views.diff, name="diff"),
+    path("wiki/<str:title>/backlinks", views.backlinks, name="backlinks"),
     path("wiki/<str:title>", views.entry, name="title")
 ]
@@ -1,37 +1,185 @@
-import re
+import hashlib
+import threading
+from functools import lru_cache
 
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.conf import settings
+from django.utils.module_loading import import_string
 
+from .instrumentation import timed
+from .signals import entries_imported, entry_saved
+from .storage import BATCH_SIZE
+from .titles import TitleIndex
 
+
+class EntryConflict(Exception):
+    """
+    Raised by save_entry when an entry no longer has the content
+    the caller expected (i.e. someone else saved it in the meantime).
+    """
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    """
+    Returns the storage backend of encyclopedia entries, configured by the
+    WIKI_STORAGE setting (default: "encyclopedia.storage.FileStorage").
+    """
+    return import_string(getattr(settings, "WIKI_STORAGE", "encyclopedia.storage.FileStorage"))()
+
+
+# Seconds between checks of the storage version by the title index (entries added
+# by other processes show up within this delay, this process's own saves at once)
+TITLES_TTL = 1
+
+# Process-wide index of entry titles (reloaded when the storage version changes)
+_titles = TitleIndex(lambda: get_storage().list_titles(), lambda: get_storage().version(), TITLES_TTL)
+
+
+@timed("list_entries")
 def list_entries():
     """
     Returns a list of all names of encyclopedia entries.
     """
-    _, filenames = default_storage.listdir("entries")
-    return list(sorted(re.sub(r"\.md$", "", filename)
-                for filename in filenames if filename.endswith(".md")))
+    return list(_titles.titles())
+
+
+def entry_exists(title):
+    """
+    Returns True if an encyclopedia entry with exactly this title exists.
+    """
+    return title in _titles
+
+
+def resolve_title(title):
+    """
+    Returns the name of the encyclopedia entry that matches the given
+    title in any casing (e.g. "css" -> "CSS"), or None if there is no
+    such entry.
+    """
+    return _titles.resolve(title)
+
+
+def random_entry():
+    """
+    Returns the name of a random encyclopedia entry, or None if
+    there are no entries.
+    """
+    return _titles.random()
+
+
+def complete_title(prefix, limit=10):
+    """
+    Returns up to limit names of encyclopedia entries that start
+    with the given prefix in any casing.
+    """
+    return _titles.complete(prefix, limit)
+
+
+def list_entries_with_prefix(prefix):
+    """
+    Returns a sorted list of the names of encyclopedia entries that
+    start with the given prefix.
+    """
+    return _titles.prefix(prefix)
+
+
+# Serializes writers within this process (the storage lock serializes processes)
+_saveLock = threading.Lock()
 
 
-def save_entry(title, content):
+def save_entry(title, content, expected_hash=None):
     """
     Saves an encyclopedia entry, given its title and Markdown
     content. If an existing entry with the same title already exists,
     it is replaced.
+
+    If expected_hash is given, the entry is only replaced if its current
+    content still has that hash (see content_hash); otherwise
+    EntryConflict is raised.
     """
-    filename = f"entries/{title}.md"
-    if default_storage.exists(filename):
-        default_storage.delete(filename)
-    default_storage.save(filename, ContentFile(content))
+    storage = get_storage()
+    with _saveLock, storage.lock(title):
+        # Get the content being replaced (if any)
+        previous = storage.read(title)
+
+        # Ensure nobody changed the entry since the caller read it
+        if expected_hash is not None:
+            if previous is None or content_hash(previous) != expected_hash:
+                raise EntryConflict(title)
+
+        # Write the entry
+        storage.write(title, content)
+
+        # Keep the title index up to date without re-listing the entries
+        _titles.add(title)
 
+        # Notify caches and indexes that depend on the entry (still under the
+        # lock, so they see saves of the same entry in order)
+        entry_saved.send(sender=None, title=title, content=content, previous=previous)
 
+
+def save_entries(entries):
+    """
+    Saves many encyclopedia entries at once, given an iterable of
+    (title, Markdown content) pairs that is consumed as a stream.
+    Entries are written in batches, and caches and indexes are
+    updated once at the end (each saved entry gets one revision with
+    its new content). Returns the titles of the saved entries.
+
+    If writing fails (or the iterable raises) partway, the exception
+    propagates, but caches and indexes are still updated for the entries
+    written before it.
+    """
+    titles = []
+    with _saveLock:
+        try:
+            for title in get_storage().write_many(entries):
+                titles.append(title)
+        finally:
+            # Reload the title index and notify caches and indexes once
+            _titles.invalidate()
+            if titles:
+                entries_imported.send(sender=None, titles=titles)
+    return titles
+
+
+@timed("get_entry")
 def get_entry(title):
     """
     Retrieves an encyclopedia entry by its title. If no such
     entry exists, the function returns None.
     """
-    try:
-        f = default_storage.open(f"entries/{title}.md")
-        return f.read().decode("utf-8")
-    except FileNotFoundError:
-        return None
+    return get_storage().read(title)
+
+
+def get_modified(title):
+    """
+    Returns the time an encyclopedia entry was last modified, or
+    None if it is unknown.
+    """
+    return get_storage().modified(title)
+
+
+def get_entries(titles):
+    """
+    Retrieves several encyclopedia entries at once. Returns a dict
+    from title to content (titles that do not exist are left out).
+    """
+    return get_storage().read_many(titles)
+
+
+def iter_entries(titles=None):
+    """
+    Yields (title, content) pairs of the given encyclopedia entries
+    (by default all of them), reading them from storage in batches.
+    """
+    titles = list_entries() if titles is None else list(titles)
+    for i in range(0, len(titles), BATCH_SIZE):
+        yield from get_entries(titles[i:i + BATCH_SIZE]).items()
+
+
+def content_hash(content):
+    """
+    Returns a hex digest that identifies the given Markdown content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
@@ -1,11 +1,23 @@
-import random
-import markdown2
+import difflib
 from django import forms
-from django.http import HttpResponse, HttpResponseRedirect
+from django.core.paginator import Paginator
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from . import util
+from . import instrumentation, links, rendering, revisions, search_index, util
+
+# Time template rendering (when instrumentation is enabled)
+render = instrumentation.timed("template")(render)
+
+# Number of search results shown per page
+RESULTS_PER_PAGE = 20
+
+# Default and maximum number of titles returned by autocomplete
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
 
 
 # Create a custom NewPageForm (i.e., a class that inherits from forms.Form class)
@@ -36,6 +48,9 @@ class EditPageForm(forms.Form):
     MDContent.label = "MarkDown Content"
     # Change HTML attrbutes of MarkDown input field (Textarea)
     MDContent.widget.attrs.update({"class": "form-control"})
+    
+    # Add a hidden field for the hash of the content being edited (to detect concurrent edits)
+    contentHash = forms.CharField(widget=forms.HiddenInput())
 
     # Extend __init__ function of parent class (to set title initial value)
     def __init__(self, *args, **kwargs):
@@ -59,19 +74,46 @@ def index(request):
     })
 
 
-def entry(request, title):
+def requestedEntry(request, title):
+    # Resolve and read the requested entry once per request (shared by the conditional GET checks and the view)
+    if not hasattr(request, "wikiEntry"):
+        # Resolve the title in any casing (e.g. "css" -> "CSS") without probing .md files
+        entryTitle = util.resolve_title(title)
+        
+        # Get entry from .md files (None if entry doesn't exist), under the title as it is stored
+        request.wikiEntry = (entryTitle or title, util.get_entry(entryTitle) if entryTitle else None)
+    return request.wikiEntry
+
+
+def entryETag(request, title):
+    # Get the requested entry
+    _, entry = requestedEntry(request, title)
     
-    # Capitalize the title (because the entries files names are capitalized)
-    if not title[0].isupper():
-        title = title.capitalize()
+    # A strong ETag derived from the entry's content (None if entry doesn't exist)
+    return util.content_hash(entry) if entry else None
+
+
+def entryLastModified(request, title):
+    # Get the requested entry
+    title, entry = requestedEntry(request, title)
     
-    # Get entry from .md files
-    entry = util.get_entry(title)
+    # Get the modification time of the entry (None if entry doesn't exist)
+    return util.get_modified(title) if entry else None
+
+
+# Always revalidate with the server, which answers 304 (Not Modified) without
+# converting Markdown or rendering templates if the entry did not change
+@cache_control(no_cache=True)
+@condition(etag_func=entryETag, last_modified_func=entryLastModified)
+def entry(request, title):
+    
+    # Get the requested entry (already read by the conditional GET checks)
+    title, entry = requestedEntry(request, title)
     
     # Ensure entry exist
     if entry:
         # Convert Markdown content to HTML
-        entry = markdown2.markdown(entry)
+        entry = rendering.entry_html(title, entry)
     
     # Render requested page
     return render(request, "encyclopedia/entry.html", {
@@ -82,69 +124,71 @@ def entry(request, title):
 
     
 def search(request):
-    # Check if method is POST
-    if request.method == "POST":
-        # Get query from the submitted form
-        query = request.POST['q']
-        
-        # Ensure query exist
-        if not query:
-            # Redirect user to main page 
-            return HttpResponseRedirect(reverse("wiki:index"))
-        
-        # Get entry from .md files (capitalized entry)
-        entry = util.get_entry(query.capitalize())
+    # Get query from the submitted form or from a results page link
+    query = request.GET.get("q")
+    
+    # Ensure query exist
+    if not query:
+        # Redirect user to main page 
+        return HttpResponseRedirect(reverse("wiki:index"))
+    
+    # Resolve the query as an entry title in any casing (e.g. "html" -> "HTML")
+    title = util.resolve_title(query)
+    
+    # Get entry from .md files
+    entry = util.get_entry(title) if title else None
+    
+    # Ensure entry exist
+    if entry:
+        # Convert Markdown content to HTML
+        entry = rendering.entry_html(title, entry)
         
-        # Ensure entry exist
-        if entry:
-            # Convert Markdown content to HTML
-            entry = markdown2.markdown(entry)
-            
-            # Render requested page
-            return render(request, "encyclopedia/entry.html", {
-                # Pass variables to template
-                "title": query,
-                "entry": entry
-            })
-        else: # maybe it's uppercased
-            # Uppercase the query
-            upperQuery = query.upper()
-            # Get entry from .md files (Upperletters entry)
-            entry = util.get_entry(upperQuery)
-            
-            # Ensuer entry exist
-            if entry:
-                # Convert Markdown content to HTML
-                entry = markdown2.markdown(entry)
-                
-                # Render requested page
-                return render(request, "encyclopedia/entry.html", {
-                    # Pass variables to template
-                    "title": query,
-                    "entry": entry
-                })
-            else:
-                # Get entries list from .md files
-                entries = util.list_entries()
-                
-                # Make an empty list for valid entries
-                validEntries = []
-                
-                # Loop over entries list
-                for entry in entries:
-                    # Ensure query is substring of entry
-                    if query.lower() in entry.lower():
-                        validEntries.append(entry)
-                
-                # Render requested page
-                return render(request, "encyclopedia/search.html", {
-                    # Pass variables to template
-                    "query": query,
-                    "entries": validEntries
-                })
+        # Render requested page
+        return render(request, "encyclopedia/entry.html", {
+            # Pass variables to template
+            "title": title,
+            "entry": entry
+        })
     
-    # Redirect user to main page 
-    return HttpResponseRedirect(reverse("wiki:index"))
+    # Get matching entries (by title and content) from the search index, best match first
+    validEntries = search_index.search(query)
+    
+    # Get the requested page of results
+    page = Paginator(validEntries, RESULTS_PER_PAGE).get_page(request.GET.get("page"))
+    
+    # Render requested page
+    return render(request, "encyclopedia/search.html", {
+        # Pass variables to template
+        "query": query,
+        "entries": page,
+        "page": page
+    })
+
+
+def autocomplete(request):
+    # Get the prefix typed so far
+    query = request.GET.get("q", "")
+    
+    # Get the number of requested titles (within bounds)
+    try:
+        limit = min(max(int(request.GET.get("limit", AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    
+    # Get titles that start with the prefix from the title index (no storage access)
+    titles = util.complete_title(query, limit) if query else []
+    
+    # Return titles as JSON
+    return JsonResponse({"query": query, "titles": titles})
+
+
+def stats(request):
+    # Ensure instrumentation is enabled
+    if not instrumentation.enabled():
+        return HttpResponse("Instrumentation is disabled (set WIKI_INSTRUMENTATION = True).", status=404)
+    
+    # Return per-stage timings (count, mean, p50, p95 and p99 in milliseconds) as JSON
+    return JsonResponse(instrumentation.stats())
 
 
 def newPage(request): 
@@ -159,7 +203,7 @@ def newPage(request):
             title = form.cleaned_data["title"]
 
             # Ensure entry is new
-            if util.get_entry(title):
+            if util.entry_exists(title):
                 # Display error message
                 return HttpResponse(f'The entry "{title}" already exist!')
             
@@ -186,10 +230,10 @@ def newPage(request):
 
 
 def editPage(request):
-    # Check if method is POST
-    if request.method == "POST":
+    # Check if method is GET (the form only reads the entry, saving is done by saveEditedPage)
+    if request.method == "GET":
         # Get the title from the submitted form
-        title = request.POST['title']
+        title = request.GET.get("title")
         
         # Ensure title exist
         if not title:
@@ -200,7 +244,7 @@ def editPage(request):
         entry = util.get_entry(title)
         if entry:
             # Create a form contains requested entry data
-            form = EditPageForm(initial={"MDContent": entry, "title": title})
+            form = EditPageForm(initial={"MDContent": entry, "title": title, "contentHash": util.content_hash(entry)})
 
             # Render requested page
             return render(request, "encyclopedia/editPage.html", {
@@ -227,18 +271,37 @@ def saveEditedPage(request):
             # Isolate the content from the 'cleaned' version of form data
             content = form.cleaned_data["MDContent"]
             
+            # Get the entry as it is now
+            currentEntry = util.get_entry(title)
+            
             # Ensure there is a change
-            if util.get_entry(title) != content:
-                # Save the page to an .md file
-                util.save_entry(title, content)
+            if currentEntry != content:
+                try:
+                    # Save the page to an .md file (only if nobody else saved it since it was opened)
+                    util.save_entry(title, content, expected_hash=form.cleaned_data["contentHash"])
+                except util.EntryConflict:
+                    # Keep the user's content, but base it on the latest version so a re-save overwrites it
+                    form = EditPageForm(initial={
+                        "MDContent": content,
+                        "title": title,
+                        "contentHash": util.content_hash(currentEntry or "")
+                    })
+                    
+                    # Re-render the page with the user's content and a warning
+                    return render(request, "encyclopedia/editPage.html", {
+                        "title": title,
+                        "Form": form,
+                        "message": "Someone else saved this page while you were editing it. "
+                                   "Saving again will replace their changes."
+                    }, status=409)
 
             # Redirect user to the entry's page.
             return HttpResponseRedirect(reverse(f"wiki:title", args=[title]))
 
         else:
             # If the form is invalid, re-render the page with existing information.
-            return render(request, "wiki/editPage.html", {
-                "title": title,
+            return render(request, "encyclopedia/editPage.html", {
+                "title": request.POST.get("title"),
                 "Form": form
             })
     
@@ -247,17 +310,19 @@ def saveEditedPage(request):
 
 
 def randomPage(request):
-    # Get all entries titles from .md files
-    entriesTitles = util.list_entries()
-
-    # Choose random entry's title from entries list
-    randomEntryTitle = random.choice(entriesTitles)
+    # Choose random entry's title from the title index (without listing .md files)
+    randomEntryTitle = util.random_entry()
+    
+    # Ensure there are entries
+    if not randomEntryTitle:
+        # Redirect user to main page 
+        return HttpResponseRedirect(reverse("wiki:index"))
     
     # Get random entry from .md files
     randomEntry = util.get_entry(randomEntryTitle)
     
-    # Convert Markdown content to HTML
-    randomEntryHTML = markdown2.markdown(randomEntry)
+    # Convert Markdown content to HTML (cached)
+    randomEntryHTML = rendering.entry_html(randomEntryTitle, randomEntry)
     
     # Render requested page
     return render(request, "encyclopedia/entry.html", {
@@ -265,3 +330,105 @@ def randomPage(request):
         "title": randomEntryTitle,
         "entry": randomEntryHTML
     })
+
+
+def history(request, title):
+    # Resolve the title in any casing (e.g. "css" -> "CSS")
+    title = util.resolve_title(title) or title
+    
+    # Render requested page
+    return render(request, "encyclopedia/history.html", {
+        # Pass entry's title and its revisions (newest first)
+        "title": title,
+        "revisions": revisions.history(title)
+    })
+
+
+def diff(request, title):
+    # Resolve the title in any casing (e.g. "css" -> "CSS")
+    title = util.resolve_title(title) or title
+    
+    # Get the latest revision of the entry
+    latest = revisions.latest(title)
+    
+    # Ensure entry has a history
+    if not latest:
+        return HttpResponse(f'The entry "{title}" has no history!', status=404)
+    
+    # Get the revisions to compare (default: the latest revision against the one before it)
+    try:
+        toNumber = int(request.GET.get("to", latest.number))
+        fromNumber = int(request.GET.get("from", toNumber - 1))
+    except ValueError:
+        return HttpResponse("Invalid revision numbers!", status=400)
+    
+    # Get the content of both revisions (an empty text before the first revision)
+    fromContent = revisions.get_content(title, fromNumber) or ""
+    toContent = revisions.get_content(title, toNumber)
+    
+    # Ensure revision exist
+    if toContent is None:
+        return HttpResponse(f'The entry "{title}" has no revision {toNumber}!', status=404)
+    
+    # Compare revisions line by line
+    lines = difflib.unified_diff(fromContent.splitlines(), toContent.splitlines(),
+                                 f"revision {fromNumber}", f"revision {toNumber}", lineterm="")
+    
+    # Render requested page
+    return render(request, "encyclopedia/diff.html", {
+        # Pass variables to template
+        "title": title,
+        "fromNumber": fromNumber,
+        "toNumber": toNumber,
+        "lines": list(lines)
+    })
+
+
+def restoreRevision(request):
+    # Check if method is POST
+    if request.method == "POST":
+        # Get the title and the revision number from the submitted form
+        title = request.POST.get("title")
+        number = request.POST.get("number")
+        
+        # Ensure title and revision number exist
+        if not title or not number or not number.isdigit():
+            return HttpResponse("No title or revision Provided!", status=400)
+        
+        # Get the content of the entry at that revision
+        content = revisions.get_content(title, int(number))
+        
+        # Ensure revision exist
+        if content is None:
+            return HttpResponse(f'The entry "{title}" has no revision {number}!', status=404)
+        
+        # Save the old content as the newest version (a new revision, history is kept)
+        if util.get_entry(title) != content:
+            util.save_entry(title, content)
+        
+        # Redirect user to the entry's page.
+        return HttpResponseRedirect(reverse("wiki:title", args=[title]))
+    
+    # Redirect user to main page 
+    return HttpResponseRedirect(reverse("wiki:index"))
+
+
+def backlinks(request, title):
+    # Resolve the title in any casing (e.g. "css" -> "CSS")
+    title = util.resolve_title(title) or title
+    
+    # Render requested page
+    return render(request, "encyclopedia/backlinks.html", {
+        # Pass entry's title, the entries that link to it and its broken links
+        "title": title,
+        "entries": links.backlinks(title),
+        "brokenLinks": links.broken_links(title)
+    })
+
+
+def brokenLinks(request):
+    # Render requested page
+    return render(request, "encyclopedia/brokenLinks.html", {
+        # Pass (source, target) pairs of links to entries that don't exist
+        "brokenLinks": links.broken_links()
+    })
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Times requests when WIKI_INSTRUMENTATION is enabled (removed otherwise)
+    'encyclopedia.instrumentation.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,8 +65,6 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                # Add a context processor (context_processors.py) to pass entriesTitles to layout templet
-                'encyclopedia.context_processors.render',
             ],
         },
     },
@@ -84,6 +84,40 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered HTML of wiki entries (LRU bounded by MAX_ENTRIES)
+    'wiki-render': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wiki-render',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+# Cache alias used by encyclopedia.rendering
+WIKI_RENDER_CACHE = 'wiki-render'
+
+# Storage backend of wiki entries: .md files under entries/ (FileStorage) or
+# the database (DatabaseStorage, see the migrate_entries command)
+WIKI_STORAGE = 'encyclopedia.storage.FileStorage'
+
+# Directory that entries are pre-rendered to as static pages (see the
+# publish_entries command), or None to disable publishing on save
+WIKI_PUBLISH_ROOT = None
+
+# Record per-stage timings of requests (storage, Markdown, templates), reported
+# at /wiki/stats and in Server-Timing headers (no overhead when disabled)
+WIKI_INSTRUMENTATION = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -5,4 +5,5 @@ admin.site.register(User)
 admin.site.register(Listing)
 admin.site.register(Bid)
 admin.site.register(Comment)
-admin.site.register(Watchlist)
\ No newline at end of file
+admin.site.register(Watchlist)
+admin.site.register(CategorySummary)
\ No newline at end of file
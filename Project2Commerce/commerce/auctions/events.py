@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+# In-process publish/subscribe of listing updates (new bids, closing), for the listing events stream.
+#
+# Subscribers of a listing share one channel: publishing stores the latest message on the channel and
+# wakes all of its subscribers at once (one asyncio.Event), so a publish costs the same however many
+# watchers the listing has, and a slow subscriber just skips to the latest message instead of queueing
+# every one. Messages only reach subscribers in the same process (with several server processes, each
+# only sees the bids placed through it).
+
+
+class _Channel:
+    def __init__(self, loop):
+        # Event loop of the subscribers (publishers may run in other threads)
+        self.loop = loop
+        # Set (and replaced) whenever a message is published
+        self.event = asyncio.Event()
+        self.message = None
+        self.subscribers = 0
+
+    def notify(self, message):
+        # Runs in the subscribers' event loop
+        self.message = message
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+# Channels by listing id and event loop
+_channels = {}
+_lock = threading.Lock()
+
+
+def hasSubscribers(listingId):
+    return int(listingId) in _channels
+
+
+def publish(listingId, message):
+    # Get the channels of the listing (if anyone is subscribed)
+    with _lock:
+        channels = list(_channels.get(int(listingId), {}).values())
+
+    # Wake the subscribers from their event loops
+    for channel in channels:
+        try:
+            channel.loop.call_soon_threadsafe(channel.notify, message)
+        except RuntimeError:
+            # The event loop is closed
+            pass
+
+
+async def subscribe(listingId, snapshot=None, keepalive=15):
+    # Yield the messages published for a listing, or None after keepalive seconds without any
+    # If given, snapshot (an async function) is awaited after subscribing and its result yielded first,
+    # so no message published in between is missed
+    listingId = int(listingId)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        channels = _channels.setdefault(listingId, {})
+        channel = channels.get(loop)
+        if channel is None:
+            channel = channels[loop] = _Channel(loop)
+        channel.subscribers += 1
+    try:
+        # Take the event before anything can be published and missed
+        event = channel.event
+        if snapshot is not None:
+            yield await snapshot()
+        while True:
+            try:
+                await asyncio.wait_for(event.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+            else:
+                event = channel.event
+                yield channel.message
+    finally:
+        with _lock:
+            channel.subscribers -= 1
+            if not channel.subscribers:
+                del channels[loop]
+                if not channels:
+                    del _channels[listingId]
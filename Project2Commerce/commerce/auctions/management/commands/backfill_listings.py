@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from auctions.models import CategorySummary, Listing
+
+
+class Command(BaseCommand):
+    help = "Recomputes the current price, bid count and highest bidder of listings from their bids."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only backfill the listings with these ids.")
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.filter(id__in=options["ids"]) if options["ids"] else None
+        count = Listing.refreshBidsSummary(listings)
+        # The category summaries depend on the current prices
+        CategorySummary.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {count} listings."))
@@ -0,0 +1,72 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from auctions.models import Listing, User
+
+# Lines of a query plan that read a whole table (or index) instead of searching it
+FULL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN (?!CONSTANT ROW)"),
+    "postgresql": re.compile(r"\bSeq Scan\b"),
+}
+
+
+class Command(BaseCommand):
+    help = ("Renders the listing, watchlist and category pages and checks that the query plan "
+            "of every query they make searches an index instead of scanning a table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to render the pages as (default: the user with the most watched listings).")
+        parser.add_argument("--listing", type=int, help="Id of the listing (and its category) to render (default: the first active listing).")
+
+    def handle(self, *args, **options):
+        fullScan = FULL_SCAN.get(connection.vendor)
+        if fullScan is None:
+            raise CommandError(f"Query plans of the {connection.vendor} database are not supported.")
+
+        # Get the user and listing to render the pages with
+        user = (User.objects.get(username=options["user"]) if options["user"] else
+                User.objects.annotate(watched=Count("userWatchlist")).order_by("-watched", "id").first())
+        listing = (Listing.objects.get(id=options["listing"]) if options["listing"] else
+                   Listing.objects.filter(isClosed=False).order_by("id").first())
+        if user is None or listing is None:
+            raise CommandError("There must be at least one user and one active listing.")
+
+        pages = [
+            reverse("commerce:listing", args=(listing.id,)),
+            reverse("commerce:watchlist"),
+            reverse("commerce:category", args=(listing.category or "none",)),
+        ]
+        failures = 0
+        for path in pages:
+            # Render the page and capture its queries
+            request = RequestFactory().get(path)
+            request.user = user
+            match = resolve(path)
+            with CaptureQueriesContext(connection) as queries:
+                match.func(request, *match.args, **match.kwargs)
+
+            # Explain every query of the page
+            self.stdout.write(path)
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+                    plan = "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+                scans = [line for line in plan.splitlines() if fullScan.search(line)]
+                if scans:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f"  Full scan: {sql}\n    " + "\n    ".join(scans)))
+                else:
+                    self.stdout.write(f"  OK: {sql}")
+
+        if failures:
+            raise CommandError(f"{failures} queries scan a whole table.")
+        self.stdout.write(self.style.SUCCESS("All queries use indexes."))
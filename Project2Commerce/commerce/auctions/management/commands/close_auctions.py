@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = "Closes auctions that are past their end time and records their winners (runs as a worker unless --once is given)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Close the expired auctions once and exit.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of auctions closed per query.")
+        parser.add_argument("--interval", type=float, default=10,
+                            help="Longest time in seconds to sleep between checks (auctions listed in the meantime may end sooner).")
+
+    def handle(self, *args, **options):
+        while True:
+            # Close the due auctions
+            closed = Listing.closeExpired(options["batch_size"])
+            if closed:
+                self.stdout.write(f"Closed {closed} auctions.")
+            if options["once"]:
+                break
+
+            # Sleep until the next auction is due, but wake up at least every interval
+            nextEndTime = Listing.nextEndTime()
+            delay = options["interval"]
+            if nextEndTime is not None:
+                delay = min(delay, max((nextEndTime - timezone.now()).total_seconds(), 0))
+            close_old_connections()
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                break
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from auctions.models import Bid, Listing, User
+
+
+class Command(BaseCommand):
+    help = ("Places bids on a throwaway listing from many threads at once and checks "
+            "that no bid was lost and no lower bid won over a higher one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Number of concurrent bidders.")
+        parser.add_argument("--bids", type=int, default=50, help="Number of bids placed by each bidder.")
+        parser.add_argument("--keep", action="store_true", help="Keep the listing, bids and users afterwards.")
+
+    def handle(self, *args, **options):
+        # Create the bidders and the listing they bid on
+        bidders = [User.objects.get_or_create(username=f"loadtest-bidder-{i}")[0]
+                   for i in range(options["threads"])]
+        listing = Listing.objects.create(title="Load test", description="Load test", startingBid=1,
+                                         lister=bidders[0])
+        accepted = []
+        errors = []
+
+        def bid(bidder):
+            try:
+                for _ in range(options["bids"]):
+                    # Outbid the price last seen (another thread may have raised it in the meantime)
+                    price = Listing.objects.values_list("currentPrice", flat=True).get(id=listing.id)
+                    placed = listing.placeBid(bidder, price + random.randint(0, 2))
+                    if placed is not None:
+                        accepted.append(placed)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # Each thread has its own database connection
+                connection.close()
+
+        threads = [threading.Thread(target=bid, args=(bidder,)) for bidder in bidders]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        try:
+            if errors:
+                raise CommandError(f"{len(errors)} bidders failed, e.g.: {errors[0]!r}")
+
+            # Check the bids against each other and against the listing's summary
+            listing.refresh_from_db()
+            bids = list(Bid.objects.filter(auction=listing).order_by("id"))
+            problems = []
+            if len(bids) != len(accepted):
+                problems.append(f"{len(accepted)} bids were accepted but {len(bids)} were saved")
+            for previous, current in zip(bids, bids[1:]):
+                if current.amount <= previous.amount:
+                    problems.append(f"bid {current.id} (${current.amount}) was accepted after "
+                                    f"bid {previous.id} (${previous.amount})")
+            if bids and (listing.bidCount != len(bids) or listing.currentPrice != bids[-1].amount
+                         or listing.highestBidder_id != bids[-1].bidder_id):
+                problems.append("the listing's current price, bid count or highest bidder "
+                                "does not match its bids")
+            if problems:
+                raise CommandError("\n".join(problems))
+        finally:
+            if not options["keep"]:
+                listing.delete()
+                User.objects.filter(id__in=[bidder.id for bidder in bidders]).delete()
+
+        attempts = options["threads"] * options["bids"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{attempts} bids in {elapsed:.2f}s ({attempts / elapsed:.0f}/s), "
+            f"{len(bids)} accepted, no lost or inverted bids."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auctions.models import CategorySummary
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-category summaries (active listings, price range, newest listing) from the listings."
+
+    def handle(self, *args, **options):
+        count = CategorySummary.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} category summaries."))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_bids_summary(apps, schema_editor):
+    # Same as Listing.refreshBidsSummary (model methods are not available here)
+    Listing = apps.get_model('auctions', 'Listing')
+    Bid = apps.get_model('auctions', 'Bid')
+    highestBids = Bid.objects.filter(auction=OuterRef('pk')).order_by('-amount', 'id')
+    bidCounts = Bid.objects.filter(auction=OuterRef('pk')).values('auction').annotate(count=Count('id')).values('count')
+    Listing.objects.update(
+        currentPrice=Coalesce(Subquery(highestBids.values('amount')[:1]), F('startingBid'),
+                              output_field=DecimalField(max_digits=15, decimal_places=2)),
+        bidCount=Coalesce(Subquery(bidCounts), 0),
+        highestBidder=Subquery(highestBids.values('bidder')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0016_alter_watchlist_watcher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='bidCount',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='currentPrice',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='highestBidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='highestBidListings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_bids_summary, migrations.RunPython.noop),
+    ]
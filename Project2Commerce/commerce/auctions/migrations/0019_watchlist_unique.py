@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_watchlists(apps, schema_editor):
+    # Keep the first Watchlist of each (watcher, auction) pair
+    Watchlist = apps.get_model('auctions', 'Watchlist')
+    firstIds = (Watchlist.objects.values('watcher', 'auction')
+                .annotate(firstId=Min('id')).values_list('firstId', flat=True))
+    Watchlist.objects.exclude(id__in=list(firstIds)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_listing_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_watchlists, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='watchlist',
+            constraint=models.UniqueConstraint(fields=('watcher', 'auction'), name='unique_watchlist'),
+        ),
+        migrations.AlterField(
+            model_name='watchlist',
+            name='watcher',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='userWatchlist', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def record_winners(apps, schema_editor):
+    # The winner of an already closed auction is its highest bidder
+    Listing = apps.get_model('auctions', 'Listing')
+    Listing.objects.filter(isClosed=True).update(winner=F('highestBidder'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0019_watchlist_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='endTime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='winner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wonListings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('isClosed', False)), fields=['endTime'], name='listing_active_end_idx'),
+        ),
+        migrations.RunPython(record_winners, migrations.RunPython.noop),
+    ]
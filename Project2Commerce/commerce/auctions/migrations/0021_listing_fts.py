@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# Full-text index of listings' titles and descriptions (SQLite FTS5 "external content" table over
+# auctions_listing), kept in sync by triggers on insert, update and delete (see auctions/search.py)
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE auctions_listing_fts USING fts5(
+        title, description, content='auctions_listing', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    # Index the existing listings
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_update",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_delete",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_insert",
+    "DROP TABLE IF EXISTS auctions_listing_fts",
+]
+
+
+def fts5_available(schema_editor):
+    # Only SQLite builds with the FTS5 extension (other databases search without the index)
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_fts(apps, schema_editor):
+    if fts5_available(schema_editor):
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0020_listing_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def summarize_categories(apps, schema_editor):
+    # Same as CategorySummary.rebuild (model methods are not available here)
+    Listing = apps.get_model('auctions', 'Listing')
+    CategorySummary = apps.get_model('auctions', 'CategorySummary')
+    for key, _ in Listing._meta.get_field('category').choices:
+        active = Listing.objects.filter(category=key, isClosed=False)
+        summary = active.aggregate(activeCount=Count('id'), minPrice=Min('currentPrice'),
+                                   maxPrice=Max('currentPrice'), newestListing_id=Max('id'))
+        CategorySummary.objects.create(category=key, **summary)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0021_listing_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySummary',
+            fields=[
+                ('category', models.CharField(choices=[('fshn', 'Fashion'), ('tys', 'Toys'), ('elc', 'Electronics'), ('hom', 'Home'), ('etc', 'Etc'), ('none', 'N/A')], max_length=4, primary_key=True, serialize=False)),
+                ('activeCount', models.PositiveIntegerField(default=0)),
+                ('minPrice', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('maxPrice', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('newestListing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auctions.listing')),
+            ],
+        ),
+        migrations.RunPython(summarize_categories, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from . import events
 
 
 class User(AbstractUser):
@@ -25,6 +30,137 @@ class Listing(models.Model):
     lister = models.ForeignKey(User, on_delete=models.CASCADE, related_name="userListings")
     isClosed = models.BooleanField(default=False)
     
+    # Denormalized bids summary (maintained by placeBid, see also the backfill_listings command)
+    # The highest bid amount, or the starting bid if there are no bids
+    currentPrice = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
+    bidCount = models.PositiveIntegerField(default=0)
+    highestBidder = models.ForeignKey(User, blank=True, null=True, on_delete=models.SET_NULL, related_name="highestBidListings")
+    
+    # When the auction closes by itself (if ever, see the close_auctions command) and who won it (recorded when it closes)
+    endTime = models.DateTimeField(blank=True, null=True)
+    winner = models.ForeignKey(User, blank=True, null=True, on_delete=models.SET_NULL, related_name="wonListings")
+    
+    # Indexes for paging through active listings (see paginateListings in views.py) by id or by price
+    # (partial indexes of the active listings, as the query planner can use them for "NOT isClosed")
+    class Meta:
+        indexes = [
+            models.Index(fields=["id"], condition=models.Q(isClosed=False), name="listing_active_id_idx"),
+            models.Index(fields=["category", "id"], condition=models.Q(isClosed=False), name="listing_category_id_idx"),
+            models.Index(fields=["currentPrice", "id"], condition=models.Q(isClosed=False), name="listing_active_price_idx"),
+            models.Index(fields=["category", "currentPrice", "id"], condition=models.Q(isClosed=False), name="listing_category_price_idx"),
+            # For finding the active listings that are due to close
+            models.Index(fields=["endTime"], condition=models.Q(isClosed=False), name="listing_active_end_idx"),
+        ]
+    
+    # Override save method (to start the current price at the starting bid, and count new listings in their category's summary)
+    def save(self, *args, **kwargs):
+        if self.currentPrice is None:
+            self.currentPrice = self.startingBid
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.isClosed:
+                CategorySummary.listingAdded(self)
+    
+    # Place a bid on this listing and update the bids summary (in one transaction)
+    # Returns the new bid, or None if the listing is closed (or past its end time) or the bid is not higher than the current price
+    def placeBid(self, bidder, amount):
+        beatsPrice = Q(bidCount=0, currentPrice__lte=amount) | Q(currentPrice__lt=amount)
+        isOpen = Q(isClosed=False) & (Q(endTime__isnull=True) | Q(endTime__gt=timezone.now()))
+
+        # Get the price the bid would replace (read before the transaction, so the transaction starts with its write)
+        previousPrice = Listing.objects.filter(id=self.id).values_list("currentPrice", flat=True).first()
+        while previousPrice is not None:
+            with transaction.atomic():
+                # Raise the price only if the bid beats it and it is still previousPrice (checked and written by the
+                # database in one statement, so concurrent bids can not both win or overwrite each other)
+                updated = Listing.objects.filter(beatsPrice, isOpen, id=self.id, currentPrice=previousPrice).update(
+                    currentPrice=amount, bidCount=F("bidCount") + 1, highestBidder=bidder)
+                if updated:
+                    bid = Bid.objects.create(amount=amount, bidder=bidder, auction=self)
+                    CategorySummary.bidPlaced(self.category, previousPrice, amount)
+                    self.publishUpdate()
+                    return bid
+
+            # Ensure another bid changed the price in the meantime, to one this bid still beats (if so, try again
+            # against the new price)
+            currentPrice = Listing.objects.filter(id=self.id).values_list("currentPrice", flat=True).first()
+            if currentPrice == previousPrice or (currentPrice is not None and currentPrice >= amount):
+                return None
+            previousPrice = currentPrice
+        return None
+    
+    # Close this auction and record its winner (the highest bidder, if any)
+    # Returns False if the auction was already closed
+    def close(self):
+        with transaction.atomic():
+            if not Listing.objects.filter(id=self.id, isClosed=False).update(isClosed=True, winner=F("highestBidder")):
+                return False
+            price = Listing.objects.filter(id=self.id).values_list("currentPrice", flat=True).get()
+            CategorySummary.listingsClosed(self.category, 1, [price], [self.id])
+            self.publishUpdate()
+        return True
+    
+    # Send the current price, bid count, highest bidder and state of this listing to the watchers of its page
+    # (see events.py and the listingEvents view) once the current transaction commits
+    def publishUpdate(self):
+        # Ensure someone is watching (in this process)
+        if not events.hasSubscribers(self.id):
+            return
+        message = Listing.objects.filter(id=self.id).values("currentPrice", "bidCount", "isClosed", "highestBidder__username").get()
+        message["currentPrice"] = str(message["currentPrice"])
+        message["highestBidder"] = message.pop("highestBidder__username")
+        transaction.on_commit(lambda: events.publish(self.id, message))
+    
+    # Close the auctions that are past their end time, in batches of batchSize listings (one UPDATE query per category of a batch)
+    # Returns the number of closed auctions
+    @classmethod
+    def closeExpired(cls, batchSize=500, now=None):
+        now = now or timezone.now()
+        closed = 0
+        while True:
+            # Get the next batch of due listings (from the index of active listings by end time)
+            due = list(cls.objects.filter(isClosed=False, endTime__lte=now).order_by("endTime")
+                       .values_list("id", "category", "currentPrice")[:batchSize])
+            if not due:
+                return closed
+            # Group them by category (their prices can not change anymore, bids past the end time are refused)
+            byCategory = {}
+            for id, category, price in due:
+                ids, prices = byCategory.setdefault(category, ([], []))
+                ids.append(id)
+                prices.append(price)
+            with transaction.atomic():
+                # Close each category's listings (unless someone else just did), record their winners, and take
+                # the ones actually closed off the category's summary (categories in order, so batches lock them alike)
+                for category, (ids, prices) in sorted(byCategory.items(), key=lambda item: item[0] or ""):
+                    count = cls.objects.filter(id__in=ids, isClosed=False).update(isClosed=True, winner=F("highestBidder"))
+                    CategorySummary.listingsClosed(category, count, prices, ids)
+                    closed += count
+            if len(due) < batchSize:
+                return closed
+    
+    # Get the end time of the next auction due to close (if any)
+    @classmethod
+    def nextEndTime(cls):
+        return cls.objects.filter(isClosed=False, endTime__isnull=False).order_by("endTime").values_list("endTime", flat=True).first()
+    
+    # Recompute the bids summary of listings from their bids (in one UPDATE query)
+    @classmethod
+    def refreshBidsSummary(cls, listings=None):
+        # The highest bid (the earliest one on ties) of each listing
+        highestBids = Bid.objects.filter(auction=OuterRef("pk")).order_by("-amount", "id")
+        # The number of bids of each listing
+        bidCounts = Bid.objects.filter(auction=OuterRef("pk")).values("auction").annotate(count=Count("id")).values("count")
+        
+        listings = cls.objects.all() if listings is None else listings
+        return listings.update(
+            currentPrice=Coalesce(Subquery(highestBids.values("amount")[:1]), F("startingBid"),
+                                  output_field=DecimalField(max_digits=15, decimal_places=2)),
+            bidCount=Coalesce(Subquery(bidCounts), 0),
+            highestBidder=Subquery(highestBids.values("bidder")[:1]))
+    
     # Override __str__ method
     def __str__(self):
         return f"{self.id}. \n\
@@ -61,10 +197,107 @@ class Comment(models.Model):
 # Watchlist model
 class Watchlist(models.Model):
     # Define table's columns
-    watcher = models.ForeignKey(User, on_delete=models.CASCADE, related_name="userWatchlist")
+    # (no separate index on watcher, the unique constraint's index starts with it)
+    watcher = models.ForeignKey(User, db_index=False, on_delete=models.CASCADE, related_name="userWatchlist")
     auction = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="listingWatchlists")
     
+    # A listing is on a user's watchlist at most once
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["watcher", "auction"], name="unique_watchlist"),
+        ]
+    
     # Override __str__ method
     def __str__(self):
         return f"{self.id}. {self.watcher} is watching ({self.auction.id}. {self.auction.title})"
 
+
+
+# Category summary model (one row per category, kept up to date as listings are created, bid on and closed)
+class CategorySummary(models.Model):
+    # Define table's columns
+    category = models.CharField(choices=Listing.CATEGORIES, max_length=4, primary_key=True)
+    activeCount = models.PositiveIntegerField(default=0)
+    # Lowest and highest current price of the active listings (if any)
+    minPrice = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
+    maxPrice = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
+    newestListing = models.ForeignKey(Listing, blank=True, null=True, on_delete=models.SET_NULL, related_name="+")
+    
+    # Get the min/max price and newest listing of a category's active listings
+    # (each is one seek in the partial indexes of active listings, not a scan)
+    @staticmethod
+    def activeAggregates(category):
+        active = Listing.objects.filter(category=category, isClosed=False)
+        return {
+            "minPrice": Subquery(active.order_by("currentPrice", "id").values("currentPrice")[:1]),
+            "maxPrice": Subquery(active.order_by("-currentPrice", "-id").values("currentPrice")[:1]),
+            "newestListing": Subquery(active.order_by("-id").values("id")[:1]),
+        }
+    
+    # The summary is updated incrementally, from the listings that changed: an aggregate is only recomputed
+    # from the listings when the listing that held it changes, and then only after locking the summary row,
+    # so the recomputing statement sees every change committed before it (an UPDATE that waited on the row
+    # would otherwise still compute from a snapshot taken before the other transaction committed)
+    
+    # Count a new active listing in its category's summary
+    @classmethod
+    def listingAdded(cls, listing):
+        # Listings without a category are not summarized
+        if listing.category is None:
+            return
+        price = listing.currentPrice
+        updated = cls.objects.filter(category=listing.category).update(
+            activeCount=F("activeCount") + 1,
+            minPrice=Least(Coalesce(F("minPrice"), price), price),
+            maxPrice=Greatest(Coalesce(F("maxPrice"), price), price),
+            newestListing=Greatest(Coalesce(F("newestListing"), listing.id), listing.id))
+        # Ensure the category has a summary
+        if not updated:
+            cls.rebuild([listing.category])
+    
+    # Update a category's summary after a listing's price rose from previousPrice to price
+    @classmethod
+    def bidPlaced(cls, category, previousPrice, price):
+        if category is None:
+            return
+        # Raise the highest price if the bid beats it (the row is only written, and locked, when it does,
+        # and the condition is checked again on the latest row if a concurrent bid updated it first)
+        cls.objects.filter(Q(maxPrice__lt=price) | Q(maxPrice__isnull=True), category=category).update(maxPrice=price)
+        # Recompute the lowest price if the listing had it
+        if list(cls.objects.select_for_update().filter(category=category, minPrice=previousPrice).values_list("category")):
+            cls.objects.filter(category=category).update(minPrice=cls.activeAggregates(category)["minPrice"])
+    
+    # Take count closed listings (of the given ids and prices) off a category's summary
+    @classmethod
+    def listingsClosed(cls, category, count, prices, ids):
+        if category is None or not count:
+            return
+        # Lock the summary row (before recomputing anything from the listings)
+        summary = cls.objects.select_for_update().filter(category=category).first()
+        if summary is None:
+            cls.rebuild([category])
+            return
+        changes = {"activeCount": F("activeCount") - count}
+        # Recompute only the aggregates that one of the listings had
+        aggregates = cls.activeAggregates(category)
+        if summary.minPrice in prices:
+            changes["minPrice"] = aggregates["minPrice"]
+        if summary.maxPrice in prices:
+            changes["maxPrice"] = aggregates["maxPrice"]
+        if summary.newestListing_id in ids:
+            changes["newestListing"] = aggregates["newestListing"]
+        cls.objects.filter(category=category).update(**changes)
+    
+    # Recompute the summaries of categories (by default all of them) from their listings
+    @classmethod
+    def rebuild(cls, categories=None):
+        categories = [key for key, _ in Listing.CATEGORIES] if categories is None else categories
+        for category in categories:
+            cls.objects.update_or_create(category=category, defaults={
+                "activeCount": Listing.objects.filter(category=category, isClosed=False).count()})
+            cls.objects.filter(category=category).update(**cls.activeAggregates(category))
+        return len(categories)
+    
+    # Override __str__ method
+    def __str__(self):
+        return f"{self.category}: {self.activeCount} active listings"
@@ -0,0 +1,52 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Full-text index of listings (created by migration 0021 on SQLite builds with FTS5)
+FTS_TABLE = "auctions_listing_fts"
+
+# Weights of the title and description columns in the ranking (a match in the title counts more)
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_ftsAvailable = None
+
+
+# Check (once) whether the database has the full-text index
+def ftsAvailable():
+    global _ftsAvailable
+    if _ftsAvailable is None:
+        _ftsAvailable = FTS_TABLE in connection.introspection.table_names()
+    return _ftsAvailable
+
+
+# Turn what the user typed into an FTS5 query: all words must match, the last one as a prefix
+# (e.g. 'red "bike' -> '"red" "bike"*'), so the user can not write FTS5 syntax errors
+def ftsQuery(text):
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+# Filter listings to the ones that match text, ranked by relevance (best first, by id on ties)
+def searchListings(listings, text):
+    query = ftsQuery(text)
+    if query is None:
+        return listings.order_by("id")
+
+    # No full-text index (not SQLite, or no FTS5): match words in the title or description
+    if not ftsAvailable():
+        for word in re.findall(r"\w+", text):
+            listings = listings.filter(Q(title__icontains=word) | Q(description__icontains=word))
+        return listings.order_by("id")
+
+    # Keep the listings that match in the full-text index, and rank each one with bm25() (lower for
+    # better matches, and only available in a query that matches the index, hence the lookup by rowid)
+    matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query])
+    rank = RawSQL(f"SELECT bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} "
+                  f"WHERE {FTS_TABLE} MATCH %s AND rowid = auctions_listing.id",
+                  [TITLE_WEIGHT, DESCRIPTION_WEIGHT, query], output_field=FloatField())
+    return listings.filter(id__in=matches).annotate(rank=rank).order_by("rank", "id")
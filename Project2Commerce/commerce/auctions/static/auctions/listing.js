@@ -0,0 +1,26 @@
+// Update the price of the listing as bids come in (see the listingEvents view)
+document.addEventListener('DOMContentLoaded', function() {
+    const price = document.querySelector('#listing-price');
+
+    // Ensure the auction is open and the browser supports Server-Sent Events
+    if (!price || !price.dataset.eventsUrl || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(price.dataset.eventsUrl);
+    source.onmessage = function(event) {
+        const listing = JSON.parse(event.data);
+
+        // The auction has been closed: reload the page to show the winner
+        if (listing.isClosed) {
+            source.close();
+            location.reload();
+            return;
+        }
+
+        // Show the highest bid (if any)
+        if (listing.bidCount) {
+            price.querySelector('p').textContent = `Highest bid: $${listing.currentPrice}`;
+        }
+    };
+});
@@ -1,3 +1,149 @@
+from decimal import Decimal
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import *
+from .views import LISTINGS_PER_PAGE
+
+
+# Keyset pagination of the index, category and watchlist pages (see views.paginateListings)
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("buyer", "buyer@example.com", "password")
+        # Listings on more than two pages, with repeated prices (to page through ties)
+        for i in range(LISTINGS_PER_PAGE * 2 + 5):
+            listing = Listing.objects.create(title=f"Listing {i}", description="A listing", startingBid=Decimal(10 + i % 7),
+                                             category="tys", lister=cls.user)
+            Watchlist.objects.create(watcher=cls.user, auction=listing)
+        cls.pages = [reverse("commerce:index"), reverse("commerce:category", args=("tys",)), reverse("commerce:watchlist")]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_malformed_cursors_give_the_first_page(self):
+        for path in self.pages:
+            first = [listing.id for listing in self.client.get(path, {"sort": "price"}).context["listings"]]
+            for after in ["", "x", "1", "1_x", "1_2_3", "x_1", "1.5.5_1"]:
+                response = self.client.get(path, {"sort": "price", "after": after})
+                self.assertEqual(response.status_code, 200, (path, after))
+                self.assertEqual([listing.id for listing in response.context["listings"]], first, (path, after))
+            response = self.client.get(path, {"after": "x"})
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(len(response.context["listings"]), LISTINGS_PER_PAGE, path)
+
+    def test_non_finite_cursors_give_the_first_page(self):
+        for path in self.pages:
+            first = [listing.id for listing in self.client.get(path, {"sort": "price"}).context["listings"]]
+            for price in ["NaN", "sNaN", "Infinity", "-Infinity", "inf"]:
+                response = self.client.get(path, {"sort": "price", "after": f"{price}_1"})
+                self.assertEqual(response.status_code, 200, (path, price))
+                self.assertEqual([listing.id for listing in response.context["listings"]], first, (path, price))
+                self.assertFalse(response.context["hasPrevious"], (path, price))
+
+    def test_following_cursors_visits_every_listing_once(self):
+        for path in self.pages:
+            for sort, key in [("id", lambda listing: listing.id), ("price", lambda listing: (listing.currentPrice, listing.id))]:
+                # Follow the next page links to the last page
+                seen = []
+                params = {"sort": sort}
+                while True:
+                    response = self.client.get(path, params)
+                    self.assertEqual(response.status_code, 200, (path, sort))
+                    seen += response.context["listings"]
+                    if not response.context["nextCursor"]:
+                        break
+                    params = {"sort": sort, "after": response.context["nextCursor"]}
+
+                # Ensure the pages cover every listing once, in order
+                self.assertEqual(len(seen), LISTINGS_PER_PAGE * 2 + 5, (path, sort))
+                self.assertEqual([key(listing) for listing in seen], sorted(key(listing) for listing in Listing.objects.all()), (path, sort))
+
+
+# Category summaries kept up to date as listings are created, bid on and closed (see CategorySummary)
+class CategorySummaryTests(TestCase):
+    def setUp(self):
+        self.lister = User.objects.create_user("lister", "lister@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+
+    def newListing(self, startingBid, **kwargs):
+        return Listing.objects.create(title="Listing", description="A listing", startingBid=Decimal(startingBid),
+                                      category="tys", lister=self.lister, **kwargs)
+
+    def assertSummary(self, activeCount, minPrice, maxPrice, newestListing):
+        summary = CategorySummary.objects.get(category="tys")
+        self.assertEqual((summary.activeCount, summary.minPrice, summary.maxPrice, summary.newestListing),
+                         (activeCount, minPrice, maxPrice, newestListing))
+
+    def test_new_listings(self):
+        first = self.newListing(20)
+        self.assertSummary(1, 20, 20, first)
+        second = self.newListing(10)
+        self.assertSummary(2, 10, 20, second)
+        third = self.newListing(30)
+        self.assertSummary(3, 10, 30, third)
+
+    def test_bids(self):
+        cheap = self.newListing(10)
+        other = self.newListing(20)
+        # A bid above the highest price raises it
+        self.assertIsNotNone(other.placeBid(self.bidder, Decimal(25)))
+        self.assertSummary(2, 10, 25, other)
+        # A bid on the cheapest listing raises the lowest price to the next cheapest one
+        self.assertIsNotNone(cheap.placeBid(self.bidder, Decimal(40)))
+        self.assertSummary(2, 25, 40, other)
+        # A rejected bid changes nothing
+        self.assertIsNone(other.placeBid(self.bidder, Decimal(25)))
+        self.assertSummary(2, 25, 40, other)
+
+    def test_bids_do_not_read_the_bid_history(self):
+        listing = self.newListing(10)
+        for amount in [11, 12, 13]:
+            with CaptureQueriesContext(connection) as queries:
+                listing.placeBid(self.bidder, Decimal(amount))
+            self.assertFalse([query["sql"] for query in queries.captured_queries
+                              if query["sql"].startswith("SELECT") and '"auctions_bid"' in query["sql"]])
+        self.assertSummary(1, 13, 13, listing)
+
+    def test_closing(self):
+        cheap = self.newListing(10)
+        middle = self.newListing(20)
+        expensive = self.newListing(30)
+        # Closing the cheapest listing raises the lowest price
+        self.assertTrue(cheap.close())
+        self.assertSummary(2, 20, 30, expensive)
+        # Closing it again changes nothing
+        self.assertFalse(cheap.close())
+        self.assertSummary(2, 20, 30, expensive)
+        # Closing the newest and most expensive listing lowers the highest price
+        self.assertTrue(expensive.close())
+        self.assertSummary(1, 20, 20, middle)
+        self.assertTrue(middle.close())
+        self.assertSummary(0, None, None, None)
+
+    def test_closing_expired_listings(self):
+        past = timezone.now() - timedelta(minutes=1)
+        cheap = self.newListing(10, endTime=past)
+        self.newListing(20, endTime=past)
+        kept = self.newListing(15, endTime=timezone.now() + timedelta(days=1))
+        expensive = self.newListing(30, endTime=past)
+        self.assertEqual(Listing.closeExpired(batchSize=2), 3)
+        self.assertSummary(1, 15, 15, kept)
+        # Listings closed before are not counted again
+        self.assertEqual(Listing.closeExpired(), 0)
+        self.assertSummary(1, 15, 15, kept)
+        self.assertTrue(Listing.objects.get(id=cheap.id).isClosed and Listing.objects.get(id=expensive.id).isClosed)
 
-# Create your tests here.
+    def test_matches_rebuild(self):
+        listings = [self.newListing(price) for price in [12, 5, 30, 18]]
+        listings[1].placeBid(self.bidder, Decimal(50))
+        listings[2].close()
+        listings[3].placeBid(self.bidder, Decimal(19))
+        summary = CategorySummary.objects.values().get(category="tys")
+        CategorySummary.rebuild(["tys"])
+        self.assertEqual(CategorySummary.objects.values().get(category="tys"), summary)
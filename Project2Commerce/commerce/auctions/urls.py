@@ -11,10 +11,12 @@ urlpatterns = [
     path("category/<str:key>", views.category, name="category"),
     path("closeAuction", views.closeAuction, name="closeAuction"),
     path("listing/<str:id>", views.listing, name="listing"),
+    path("listing/<str:id>/events", views.listingEvents, name="listingEvents"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("newListing", views.newListing, name="newListing"),
     path("register", views.register, name="register"),
     path("removeWatchlist", views.removeWatchlist, name="removeWatchlist"),
+    path("search", views.search, name="search"),
     path("watchlist", views.watchlist, name="watchlist")
 ]
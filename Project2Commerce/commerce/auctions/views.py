@@ -1,17 +1,82 @@
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
 from django import forms
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Case, CharField, Exists, OuterRef, Prefetch, Q, Value, When
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse
+from django.utils import timezone
 
+from . import events
+from .search import searchListings
 from .models import *
 
 CATEGORIES = {}
 for KEY, VALUE in Listing.CATEGORIES:
     CATEGORIES[KEY] = VALUE
 
+# Resolve the name of a listing's category in the database query (e.g. "tys" -> "Toys")
+CATEGORY_NAME = Case(*[When(category=KEY, then=Value(VALUE)) for KEY, VALUE in Listing.CATEGORIES],
+                     default=Value(CATEGORIES["none"]), output_field=CharField())
+
+
+# Add the category's name to each listing (in the same query)
+def annotateListings(listings):
+    return listings.annotate(categoryName=CATEGORY_NAME)
+
+
+# Number of listings on each page of listings
+LISTINGS_PER_PAGE = 24
+
+
+# Get the page of listings after the cursor in the request (keyset pagination, so every page costs the same as the first one)
+# Listings are sorted by id (?sort=id, default) or by current price (?sort=price), and ?after= is the sort key of the last listing on the previous page
+def paginateListings(request, listings):
+    # Get sort order
+    sort = "price" if request.GET.get("sort") == "price" else "id"
+    
+    # Get the listings after the cursor (an invalid cursor gives the first page)
+    after = request.GET.get("after")
+    try:
+        if after and sort == "price":
+            price, id = after.split("_")
+            price, id = Decimal(price), int(id)
+            # Ensure the price is a number (the database can not compare with NaN or Infinity)
+            if not price.is_finite():
+                raise ValueError(after)
+            listings = listings.filter(Q(currentPrice__gt=price) | Q(id__gt=id), currentPrice__gte=price)
+        elif after:
+            listings = listings.filter(id__gt=int(after))
+    except (ValueError, InvalidOperation):
+        after = None
+    listings = listings.order_by("currentPrice", "id") if sort == "price" else listings.order_by("id")
+    
+    # Get one more listing than fits on the page to know if there is a next page
+    listings = list(annotateListings(listings)[:LISTINGS_PER_PAGE + 1])
+    nextCursor = None
+    if len(listings) > LISTINGS_PER_PAGE:
+        listings = listings[:LISTINGS_PER_PAGE]
+        last = listings[-1]
+        nextCursor = f"{last.currentPrice}_{last.id}" if sort == "price" else str(last.id)
+    
+    return {
+        # Listings of the page (annotated with categoryName)
+        "listings": listings,
+        # Sort order of the listings
+        "sort": sort,
+        # Cursor of the next page (if any)
+        "nextCursor": nextCursor,
+        # Whether there are previous pages
+        "hasPrevious": bool(after),
+    }
+
 
 class NewListingForm(forms.Form):  # Create a form for new listing
     # Add a title input field (- default: TextInput)
@@ -48,6 +113,47 @@ class NewListingForm(forms.Form):  # Create a form for new listing
     category.label = "Category"
     # Change HTML attrbutes of category input field
     category.widget.attrs.update({"class": "form-control"})
+    
+    # Add a duration input field (- default: Select), in days (empty: the auction stays open until the lister closes it)
+    duration = forms.TypedChoiceField(choices=[("", "Until I close it"), (1, "1 day"), (3, "3 days"), (7, "7 days"), (14, "14 days")],
+                                      coerce=int, empty_value=None, required=False)
+    # Set label for duration input field
+    duration.label = "Duration"
+    # Change HTML attrbutes of duration input field
+    duration.widget.attrs.update({"class": "form-control"})
+
+
+class SearchForm(forms.Form):  # Create a form for searching listings
+    # Add a q (i.e., query) input field (- default: TextInput)
+    q = forms.CharField(required=False)
+    # Set label for q input field
+    q.label = "Search"
+    # Change HTML attrbutes of q input field
+    q.widget.attrs.update({"class": "form-control", "placeholder": "Search listings"})
+    
+    # Add a category input field (- default: Select)
+    category = forms.ChoiceField(choices=[("", "Any")] + Listing.CATEGORIES, required=False)
+    # Set label for category input field
+    category.label = "Category"
+    # Change HTML attrbutes of category input field
+    category.widget.attrs.update({"class": "form-control"})
+    
+    # Add minPrice and maxPrice input fields (- default: NumberInput), compared with the current price
+    minPrice = forms.DecimalField(decimal_places=2, min_value=0, required=False)
+    maxPrice = forms.DecimalField(decimal_places=2, min_value=0, required=False)
+    # Set labels for minPrice and maxPrice input fields
+    minPrice.label = "Min price"
+    maxPrice.label = "Max price"
+    # Change HTML attrbutes of minPrice and maxPrice input fields
+    minPrice.widget.attrs.update({"class": "form-control"})
+    maxPrice.widget.attrs.update({"class": "form-control"})
+    
+    # Add a status input field (- default: Select)
+    status = forms.ChoiceField(choices=[("open", "Active"), ("closed", "Closed"), ("all", "All")], required=False)
+    # Set label for status input field
+    status.label = "Status"
+    # Change HTML attrbutes of status input field
+    status.widget.attrs.update({"class": "form-control"})
 
 
 class hiddinListingIdForm(forms.Form):  # Create a form for hiddin listing id
@@ -88,36 +194,9 @@ class AddCommentForm(hiddinListingIdForm):  # Create a form for adding a comment
 
 # Active listings page (view)
 def index(request):
-    # Get all active listings from database
-    listings = Listing.objects.filter(isClosed=False)
-    
-    # Create an empty list to store data of listings
-    data = []
-    
-    # Loop over listings
-    for listing in listings:
-        ''' Get the max bid amount for current listing '''
-        # Get all bids.amounts for current listing
-        # flat=True returns List/QuerySet instead of List/QuerySet of 1-tuples
-        bidsAmounts = listing.listingBids.values_list("amount", flat=True)
-        # Ensure there are any bids for current listing
-        if bidsAmounts:
-            # Get the max bid amount for current listing
-            maxBidAmount = max(bidsAmounts)
-        # There is no bids for current listing
-        else:
-            maxBidAmount = None
-        
-        ''' Get the category of current listing '''
-        category = CATEGORIES[listing.category]
-                
-        ''' Restructure data of listings'''
-        data.append((listing, maxBidAmount, category))
-    
-    return render(request, "auctions/index.html", {
-        # Pass data of listings
-        "data": data
-    })
+    # Get a page of active listings with their category from database (in one query)
+    # Pass listings (and pagination)
+    return render(request, "auctions/index.html", paginateListings(request, Listing.objects.filter(isClosed=False)))
 
 
 # Login page (view)
@@ -191,6 +270,7 @@ def newListing(request):
             startingBid = form.cleaned_data["startingBid"]
             imgURL = form.cleaned_data["imgURL"]
             category = form.cleaned_data["category"]
+            duration = form.cleaned_data["duration"]
             
             # Get the lister of submitted listing
             lister = request.user
@@ -221,6 +301,10 @@ def newListing(request):
                                   startingBid=startingBid,
                                   lister=lister)
             
+            # Set when the auction closes by itself (if it does)
+            if duration:
+                listing.endTime = timezone.now() + timedelta(days=duration)
+            
             # Save data in database (Listing(s) table)
             listing.save()
 
@@ -243,17 +327,22 @@ def newListing(request):
 
 # Listing page (view)
 def listing(request, id):
-    # Get the listing that has the submitted id from database
-    listing = Listing.objects.get(id=id)
+    # Get the listing that has the submitted id from database, with its lister and winner,
+    # whether it is on the watchlist of current user, and its comments with their commenters (in two queries)
+    if request.user.is_authenticated:
+        isOnWatchlist = Exists(Watchlist.objects.filter(watcher=request.user, auction=OuterRef("pk")))
+    else:
+        isOnWatchlist = Value(False)
+    listing = (Listing.objects
+               .select_related("lister", "winner")
+               .annotate(isOnWatchlist=isOnWatchlist)
+               .prefetch_related(Prefetch("listingComments", queryset=Comment.objects.select_related("commenter").order_by("id")))
+               .get(id=id))
     
     ''' Get the max bid amount for this listing '''
-    # Get all bids.amounts for current listing
-    # flat=True returns List/QuerySet instead of List/QuerySet of 1-tuples
-    bidsAmounts = listing.listingBids.values_list("amount", flat=True)
-    # Ensure current listing have bids
-    if bidsAmounts:
-        # Get the max bid amount for this listing
-        maxBidAmount = max(bidsAmounts)
+    # Ensure current listing have bids (the current price is then the highest bid)
+    if listing.bidCount:
+        maxBidAmount = listing.currentPrice
     # There is no bids for current listing
     else:
         maxBidAmount = None
@@ -265,31 +354,17 @@ def listing(request, id):
     winner = ""
     # Ensure auction is closed
     if listing.isClosed:
-        # Ensure there is highest bid
-        if maxBidAmount:
-            # Get the user who has the highest bid on current listing
-            winner = listing.listingBids.get(amount=maxBidAmount).bidder
+        # Ensure there is a winner (recorded when the auction was closed)
+        if listing.winner:
+            winner = listing.winner
             
-    ''' Get comments on current listing '''
-    try:
-        comments = Comment.objects.filter(auction=listing)
-    except Comment.DoesNotExist:
-        comments = []    
+    ''' Get comments on current listing (already fetched) '''
+    comments = listing.listingComments.all()
 
     # If the user is signed in
     if request.user.is_authenticated:
-        # try to check if the listing is in the watchlist of the user
-        try: 
-            if Watchlist.objects.get(watcher=request.user, auction=listing):
-                isOnWatchlistOfUser = True
-        # the listing is not on the watchlist of the user
-        except Watchlist.DoesNotExist:
-            isOnWatchlistOfUser = False
-        
         # Ensure that current user is the creator of current listing
-        userIsLister = False
-        if listing.lister == request.user:
-            userIsLister = True
+        userIsLister = listing.lister_id == request.user.id
         
         # Ensure user is the winner
         if request.user == winner:
@@ -310,7 +385,7 @@ def listing(request, id):
             # Pass a form to add a comment
             "AddCommentForm": AddCommentForm(initial={"listingId": id}),
             # Pass if listing is on watchlist for current user or not
-            "isOnWatchlist": isOnWatchlistOfUser,
+            "isOnWatchlist": listing.isOnWatchlist,
             # Pass a form to add a bid
             "AddBidForm": AddBidForm(initial={"listingId": id}),
             # Pass a form to add/remove listing to/from watchlist buttons
@@ -334,6 +409,49 @@ def listing(request, id):
     })
 
 
+# Format a message as a server-sent event
+def serverSentEvent(message):
+    return f"data: {json.dumps(message)}\n\n"
+
+
+# Listing events stream (view)
+# Server-Sent Events with the price, bid count, highest bidder and state of a listing, sent whenever they change
+async def listingEvents(request, id):
+    # Ensure the listing exists
+    if not await Listing.objects.filter(id=id).aexists():
+        return HttpResponse("The listing does not exist", status=404)
+    
+    # Get the current state of the listing from database
+    async def snapshot():
+        state = await Listing.objects.filter(id=id).values("currentPrice", "bidCount", "isClosed", "highestBidder__username").aget()
+        state["currentPrice"] = str(state["currentPrice"])
+        state["highestBidder"] = state.pop("highestBidder__username")
+        return state
+    
+    # Served through WSGI (no long-lived connections): send the current state, and let the browser reconnect (poll) a few seconds later
+    if not isinstance(request, ASGIRequest):
+        response = HttpResponse(f"retry: 5000\n{serverSentEvent(await snapshot())}", content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        return response
+    
+    # Served through ASGI: send the current state, then every update until the auction closes
+    async def stream():
+        async for message in events.subscribe(id, snapshot):
+            # Send a comment every now and then to keep the connection open
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            yield serverSentEvent(message)
+            if message["isClosed"]:
+                break
+    
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Ask proxies (e.g. nginx) not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # Watchlist page/form (view)
 @login_required
 def watchlist(request):
@@ -353,54 +471,16 @@ def watchlist(request):
         # From database get the listing that have the provided id
         listing = Listing.objects.get(id=listingId)
         
-        # Create a new Watchlist for current user and listing
-        watchlist = Watchlist(watcher=request.user, auction=listing)
-        
-        # Save the new created Watchlist in database
-        watchlist.save()
+        # Create a new Watchlist for current user and listing (unless the listing is already on the watchlist)
+        Watchlist.objects.get_or_create(watcher=request.user, auction=listing)
         
         # Redirect user to the listing's page that has been added from user's watchlist
         return HttpResponseRedirect(reverse(f"commerce:listing", args=(listingId,)))
     
     # The method is GET
-    # From database get the User that has the same username as current signed in user
-    user = User.objects.get(username=request.user)
-    
-    # From database, get the watchlist of user
-    userWatchlist = user.userWatchlist.all()
-    
-    # Get Listing objects from user's Watchlist object
-    listings = []
-    for listing in userWatchlist:        
-        listings.append(listing.auction)
-    
-    # Create an empty list to store data of listings
-    data = []
-    
-    # Loop over listings
-    for listing in listings:
-        ''' Get the max bid amount for current listing '''
-        # Get all bids.amounts for current listing
-        # flat=True returns List/QuerySet instead of List/QuerySet of 1-tuples
-        bidsAmounts = listing.listingBids.values_list("amount", flat=True)
-        if bidsAmounts:
-            # Get the max bid amount for current listing
-            maxBidAmount = max(bidsAmounts)
-        # There is no bids for current listing
-        else:
-            maxBidAmount = None
-    
-        ''' Get the category of current listing '''
-        category = {"key": listing.category, "value": CATEGORIES[listing.category]}
-                
-        ''' Restructure data of listings'''
-        data.append((listing, maxBidAmount, category))
-    
-    # Render the requested template
-    return render(request, "auctions/watchlist.html", {
-        # Pass watchlist's data
-        "data": data
-    })
+    # From database, get a page of the listings on the watchlist of current user with their category (in one query)
+    # Render the requested template (pass watchlist's listings and pagination)
+    return render(request, "auctions/watchlist.html", paginateListings(request, Listing.objects.filter(listingWatchlists__watcher=request.user)))
 
 
 # removeWatchlist form (view)
@@ -422,11 +502,8 @@ def removeWatchlist(request):
         # From database get the listing that have the provided id
         listing = Listing.objects.get(id=listingId)
         
-        # Create the Watchlist object for current user and listing
-        watchlist = Watchlist.objects.get(watcher=request.user, auction=listing)
-        
-        # Remove watchlist from database
-        watchlist.delete()
+        # Remove the Watchlist of current user and listing from database (if it is still there)
+        Watchlist.objects.filter(watcher=request.user, auction=listing).delete()
         
         # Redirect user to the listing's page that has been deleted from user's watchlist
         return HttpResponseRedirect(reverse(f"commerce:listing", args=(listingId,)))
@@ -451,27 +528,10 @@ def addBid(request):
         # Get the listing (i.e., Listing object) that the user wants to bid on
         listing = Listing.objects.get(id=listingId)
         
-        # From database, get bids amounts on the listing that the user wants to bid on
-        # flat=True returns List/QuerySet instead of List/QuerySet of 1-tuples
-        bidsAmounts = listing.listingBids.values_list("amount", flat=True)
-        
-        # Ensure there are bids for current listing
-        if bidsAmounts:
-            # Get the max bid amount
-            maxBidAmount = max(bidsAmounts)
-        # There are no bids for current listing
-        else:
-            maxBidAmount = 0
-        
-        # Ensure that the bid is at least as large as the starting bid, and greater than any other bids that have been placed (if any).
-        if addedBid < listing.startingBid or addedBid <= maxBidAmount:
-            return HttpResponse("The bid must be at least as large as the starting bid, and must be greater than any other bids.")
-        
-        # Create a new Bid object for user's bid on current listing
-        bid = Bid(amount=addedBid, bidder=request.user, auction=listing)
-        
-        # Save Bid object in database
-        bid.save()
+        # Save user's bid on current listing (and update the listing's current price)
+        # The bid is only placed if, at that moment, it is at least as large as the starting bid, and greater than any other bids that have been placed (if any).
+        if listing.placeBid(request.user, addedBid) is None:
+            return HttpResponse("The auction must be open, and the bid must be at least as large as the starting bid, and must be greater than any other bids.")
         
         # Redirect user to the listing that they has bidded on
         return HttpResponseRedirect(reverse(f"commerce:listing", args=(listingId,)))
@@ -495,11 +555,8 @@ def closeAuction(request):
         # Get the listing (i.e., Listing object) that the user wants to close
         listing = Listing.objects.get(id=listingId)
         
-        # Close auction
-        listing.isClosed = True
-        
-        # Save listing in database
-        listing.save()
+        # Close auction (and record its winner) in database
+        listing.close()
         
         # Reture user to the listing that the user has closed
         return HttpResponseRedirect(reverse(f"commerce:listing", args=(listingId,)))
@@ -539,46 +596,71 @@ def addComment(request):
 
 # categories page (view)
 def categories(request):
+    # Get the summary of each category (active listings count, price range and newest listing) from database (in one query)
+    summaries = {summary.category: summary for summary in CategorySummary.objects.select_related("newestListing")}
+    
     # Render requested template
     return render(request, "auctions/categories.html", {
-        # Pass default CATEGORIES
-        "CATEGORIES": CATEGORIES
+        # Pass default CATEGORIES with their summaries (if any)
+        "CATEGORIES": [(KEY, VALUE, summaries.get(KEY)) for KEY, VALUE in Listing.CATEGORIES]
     })
 
 
-# category page (view)
-def category(request, key):
-    # Get the listings of current category (i.e., current key)
-    listings = Listing.objects.filter(category=key)
+# Search page (view)
+def search(request):
+    # Take in the data the user submitted (in the query string) and save it as form
+    form = SearchForm(request.GET)
     
-    # Create an empty list to store data of listings
-    data = []
+    # Ensure form data is valid (server-side), else show no results
+    if not form.is_valid():
+        return render(request, "auctions/search.html", {
+            "SearchForm": form
+        })
     
-    ''' Get the category from default CATEGORIES'''
-    category = {"key": key, "value": CATEGORIES[key]}
+    ''' Filter listings '''
+    listings = Listing.objects.all()
+    # Filter by status (active listings by default)
+    status = form.cleaned_data["status"] or "open"
+    if status != "all":
+        listings = listings.filter(isClosed=(status == "closed"))
+    # Filter by category (if any)
+    if form.cleaned_data["category"]:
+        listings = listings.filter(category=form.cleaned_data["category"])
+    # Filter by price range (if any)
+    if form.cleaned_data["minPrice"] is not None:
+        listings = listings.filter(currentPrice__gte=form.cleaned_data["minPrice"])
+    if form.cleaned_data["maxPrice"] is not None:
+        listings = listings.filter(currentPrice__lte=form.cleaned_data["maxPrice"])
     
-    # Loop over listings
-    for listing in listings:
-        ''' Get the max bid amount for current listing '''
-        # Get all bids.amounts for current listing
-        # flat=True returns List/QuerySet instead of List/QuerySet of 1-tuples
-        bidsAmounts = listing.listingBids.values_list("amount", flat=True)
-        # Ensure current listing has bids
-        if bidsAmounts:
-            # Get the max bid amount for current listing
-            maxBidAmount = max(bidsAmounts)
-        # There is no bids for current listing
-        else:
-            maxBidAmount = None
-        
-        ''' Restructure data of listings'''
-        data.append((listing, maxBidAmount, category))
+    # Get the listings that match the query from the full-text index, best matches first
+    listings = annotateListings(searchListings(listings, form.cleaned_data["q"]))
     
-    # Render requested template    
-    return render(request, "auctions/category.html", {
-        # Pass current categroy
-        "category": category,
-        # Pass
-        "data": data
+    # Get the requested page of results
+    page = Paginator(listings, LISTINGS_PER_PAGE).get_page(request.GET.get("page"))
+    
+    # Keep the search (without the page) in the links to other pages
+    query = request.GET.copy()
+    query.pop("page", None)
+    
+    # Render requested template
+    return render(request, "auctions/search.html", {
+        # Pass the form (with the search)
+        "SearchForm": form,
+        # Pass the page of results
+        "page": page,
+        # Pass the search as a query string
+        "query": query.urlencode()
     })
 
+
+# category page (view)
+def category(request, key):
+    # Get a page of the active listings of current category (i.e., current key) with their category (in one query)
+    context = paginateListings(request, Listing.objects.filter(category=key, isClosed=False))
+    
+    ''' Get the category from default CATEGORIES'''
+    # Pass current categroy
+    context["category"] = {"key": key, "value": CATEGORIES[key]}
+    
+    # Render requested template (pass listings of current category and pagination)
+    return render(request, "auctions/category.html", context)